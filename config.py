@@ -22,9 +22,16 @@ DB_PATH = os.path.join(DATA_DIR, "users.db")
 # Лимит поиска (сколько результатов на страницу и т.д.) — если нужно
 SEARCH_RESULTS_PER_PAGE = 5
 
+# Пауза (сек) перед перерисовкой страницы: серия быстрых нажатий «Вперёд/Назад» даёт одно редактирование
+PAGINATION_DEBOUNCE_SECONDS = 0.3
+
 # Максимальная длина названия книги в имени файла (без учета длины имени автора и ID)
 MAX_TITLE_LENGTH = 30 
 
+# Книги больше этого размера не скачиваем: бот всё равно не может отправить файл больше 50 МБ,
+# а PTB перед отправкой читает документ в память целиком
+DOWNLOAD_MAX_BYTES = 50 * 1024 * 1024
+
 # Логи, статистика
 LOG_FILE = os.path.join(DATA_DIR, "bot.log")
 STATS_FILE = os.path.join(DATA_DIR, "stats.log")
@@ -35,12 +42,37 @@ STATS_FILE = os.path.join(DATA_DIR, "stats.log")
 #  - 0.5 => 1 запрос каждые 2 секунды
 RATE_LIMIT_RPS = 0.5
 
+# --- Исходящие запросы к Telegram (AIORateLimiter) ---
+# Общий лимит бота — чуть ниже 30 сообщений/с, для групп — не больше 20 сообщений/мин
+TG_OVERALL_MAX_RATE = 28
+TG_GROUP_MAX_RATE = 18
+# Сколько раз повторять запрос после RetryAfter (flood wait) от Telegram
+TG_MAX_RETRIES = 3
+
 # Таймаут HTTP-запросов к зеркалам Флибусты (сек). Сайт иногда отвечает >10 с.
 FETCH_TIMEOUT_SECONDS = 25
 
+# Сколько секунд держать в памяти распарсенные карточки книг и списки книг автора
+SCRAPE_CACHE_TTL = 900
+# Сколько секунд помнить результаты поиска по одному и тому же запросу
+SEARCH_CACHE_TTL = 300
+
+# --- Webhook ---
+# Если WEBHOOK_URL задан (например "https://bot.example.com"), бот принимает апдейты
+# через webhook на WEBHOOK_LISTEN:WEBHOOK_PORT; иначе — long polling (удобно для разработки).
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "")
+WEBHOOK_LISTEN = os.environ.get("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "8443"))
+# Путь webhook'а; по умолчанию — токен бота, чтобы адрес нельзя было угадать
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "")
+# Необязательный secret_token: Telegram присылает его в заголовке каждого запроса
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET", "")
+
 # --- Время отправки отчётов ---
 # Строка "HH:MM", например "16:45".
 SEND_REPORT_TIME = "16:45"
 
 # Очистка из оперативной памяти данных старше указанного ниже числа (в секундах)
-DATA_EXPIRATION_TIME = 600
\ No newline at end of file
+DATA_EXPIRATION_TIME = 600
+# Результаты поиска (для пагинации) живут дольше — пользователь может вернуться к списку
+SEARCH_DATA_EXPIRATION_TIME = 3600
@@ -5,16 +5,18 @@ import re
 from typing import Optional
 
 from telegram import Update
+from telegram.constants import ChatAction
 from telegram.ext import ContextTypes
 
 from services.service import get_author_books
-from config import SEARCH_RESULTS_PER_PAGE
-from utils.chat_actions import set_typing_action
-from utils.pagination import build_page_text, build_pagination_kb
+from utils.chat_actions import run_with_periodic_action
+from utils.pagination import build_page_text, build_pagination_kb, build_pages_text
 from utils.state import get_author_mapping, set_user_search_data
 
 logger = logging.getLogger(__name__)
 
+AUTHOR_CMD_RE = re.compile(r"^/author(\d+)$", re.IGNORECASE)
+
 
 async def _safe_reply_text(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> None:
     """
@@ -34,15 +36,18 @@ async def _safe_reply_text(update: Update, context: ContextTypes.DEFAULT_TYPE, t
         logger.warning("Не удалось отправить сообщение пользователю: %s", e)
 
 
-async def author_books_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def author_books_command(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    author_id: Optional[str] = None,
+) -> None:
     """
     Обрабатывает команду /author<ID> (с возможным @BotName).
     Примеры:
       /author123456
       /author123456@MyBot
+    Если вызывающий уже разобрал команду, он передаёт author_id — текст повторно не парсим.
     """
-    await set_typing_action(update, context)
-
     user = update.effective_user
     if user is None:
         logger.warning("author_books_command: effective_user is None")
@@ -50,28 +55,35 @@ async def author_books_command(update: Update, context: ContextTypes.DEFAULT_TYP
         return
     user_id = user.id
 
-    if update.message is None or not update.message.text:
-        logger.warning("author_books_command: message или текст отсутствуют")
-        await _safe_reply_text(update, context, "Некорректная команда. Используйте формат: /author<ID>")
-        return
+    if author_id is None:
+        if update.message is None or not update.message.text:
+            logger.warning("author_books_command: message или текст отсутствуют")
+            await _safe_reply_text(update, context, "Некорректная команда. Используйте формат: /author<ID>")
+            return
 
-    # исходный текст команды
-    text = update.message.text.strip()
-    # ✂️ если есть "@..." — отрезаем
-    if "@" in text:
-        text = text.split("@", 1)[0]
+        # исходный текст команды
+        text = update.message.text.strip()
+        # ✂️ если есть "@..." — отрезаем
+        if "@" in text:
+            text = text.split("@", 1)[0]
 
-    # парсим ID автора
-    m = re.match(r"^/author(\d+)$", text, re.IGNORECASE)
-    if not m:
-        await _safe_reply_text(update, context, "Некорректная команда. Используйте формат: /author<ID>")
-        return
+        # парсим ID автора
+        m = AUTHOR_CMD_RE.match(text)
+        if not m:
+            await _safe_reply_text(update, context, "Некорректная команда. Используйте формат: /author<ID>")
+            return
+        author_id = m.group(1)
 
-    author_id = m.group(1)
     default_author = get_author_mapping(author_id)
 
     try:
-        books = await get_author_books(author_id, default_author=default_author)
+        books = await run_with_periodic_action(
+            get_author_books(author_id, default_author=default_author),
+            update,
+            context,
+            action=ChatAction.TYPING,
+            interval=4,
+        )
     except Exception as e:
         logger.exception("Ошибка при получении книг автора %s: %s", author_id, e)
         await _safe_reply_text(update, context, "Не удалось получить книги автора.")
@@ -90,15 +102,14 @@ async def author_books_command(update: Update, context: ContextTypes.DEFAULT_TYP
 
     records = [_line(b.get("title"), b.get("author"), b.get("id")) for b in books]
 
-    total_pages = max(1, (len(records) + SEARCH_RESULTS_PER_PAGE - 1) // SEARCH_RESULTS_PER_PAGE)
-    set_user_search_data(user_id, records, total_pages)
+    set_user_search_data(user_id, build_pages_text(records))
 
     page_text = build_page_text(user_id)
     keyboard = build_pagination_kb(user_id)
 
     try:
         if update.message is not None:
-            await update.message.reply_text(page_text, reply_markup=keyboard)
+            await update.message.reply_text(page_text, reply_markup=keyboard, disable_web_page_preview=True)
         else:
             await _safe_reply_text(update, context, page_text)
     except Exception as e:
@@ -1,26 +1,24 @@
 # handlers/book_handler.py
 
+import asyncio
 import logging
-from typing import Iterable, List, Sequence
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.constants import ParseMode, ChatAction
 from telegram.ext import ContextTypes
+from telegram.error import TelegramError
 
-from services.service import get_book_details, download_book
+from services.service import BookTooLargeError, get_book_details, download_book
 from services.db import get_user_settings
 from utils.utils import sanitize_filename, shorten_title
-from utils.chat_actions import set_upload_document_action, run_with_periodic_action
+from utils.chat_actions import run_with_periodic_action
 from config import MAX_TITLE_LENGTH
 
 logger = logging.getLogger(__name__)
 
 CAPTION_LIMIT = 1024  # лимит подписи к медиа в Telegram
-
-
-def _chunk(seq: Sequence[str], size: int) -> Iterable[List[str]]:
-    for i in range(0, len(seq), size):
-        yield list(seq[i : i + size])
+# Порядок кнопок форматов; неизвестные форматы — в конце
+FORMAT_ORDER = {"fb2": 0, "epub": 1, "mobi": 2, "pdf": 3}
 
 
 def _trim_caption_for_photo(text: str, limit: int = CAPTION_LIMIT) -> str:
@@ -31,6 +29,12 @@ def _trim_caption_for_photo(text: str, limit: int = CAPTION_LIMIT) -> str:
     return text[:hard_limit] + "…"
 
 
+def _discard_task(task: "asyncio.Task") -> None:
+    """Отменяет ненужную задачу и забирает её исключение, если она уже успела упасть."""
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
 async def _safe_reply_text(
     update: Update,
     context: ContextTypes.DEFAULT_TYPE,
@@ -74,7 +78,7 @@ async def _safe_reply_photo(
                 reply_markup=reply_markup,
             )
             return msg.message_id
-    except Exception as e:
+    except TelegramError as e:
         logger.warning("Не удалось отправить фото по URL (%s). Падаем на текст: %s", photo, e)
 
     # fallback — просто текст
@@ -88,24 +92,19 @@ async def send_book_details_message(update: Update, context: ContextTypes.DEFAUL
     """
     title = details.get("title") or "Без названия"
 
-    parts: list[str] = [f"📚 <i><b>{title}</b></i>"]
-
-    if details.get("author"):
-        parts.append("━━━━━━━━━━━━━")
-        parts.append(f"👤 <b>Автор:</b> {details['author']}")
-    if details.get("year"):
-        parts.append(f"📅 <b>Год:</b> {details['year']}")
-    if details.get("annotation"):
-        parts.append("━━━━━━━━━━━━━")
-        parts.append(f"📝 <i>{details['annotation']}</i>")
-
-    caption = "\n".join(parts)
+    # Отсутствующие поля дают None и отфильтровываются
+    caption = "\n".join(filter(None, (
+        f"📚 <i><b>{title}</b></i>",
+        f"━━━━━━━━━━━━━\n👤 <b>Автор:</b> {author}" if (author := details.get("author")) else None,
+        f"📅 <b>Год:</b> {year}" if (year := details.get("year")) else None,
+        f"━━━━━━━━━━━━━\n📝 <i>{annotation}</i>" if (annotation := details.get("annotation")) else None,
+    )))
 
     # Кнопки форматов — аккуратно и детерминированно
     formats_raw = details.get("formats") or []
     formats = sorted(
         set(formats_raw),
-        key=lambda x: ("fb2", "epub", "mobi", "pdf").index(x) if x in ("fb2", "epub", "mobi", "pdf") else 999,
+        key=lambda x: FORMAT_ORDER.get(x, 999),
     )
 
     if not formats:
@@ -113,14 +112,10 @@ async def send_book_details_message(update: Update, context: ContextTypes.DEFAUL
             [[InlineKeyboardButton("Отсутствуют поддерживаемые форматы", callback_data="no-op")]]
         )
     else:
-        rows: list[list[InlineKeyboardButton]] = []
-        for row_formats in _chunk(formats, 3):
-            row = [
-                InlineKeyboardButton(fmt, callback_data=f"choose_format|{details['id']}|{fmt}")
-                for fmt in row_formats
-            ]
-            rows.append(row)
-        keyboard = InlineKeyboardMarkup(rows)
+        cb_prefix = f"choose_format|{details['id']}|"
+        buttons = [InlineKeyboardButton(fmt, callback_data=cb_prefix + fmt) for fmt in formats]
+        # по 3 кнопки в ряд
+        keyboard = InlineKeyboardMarkup([buttons[i : i + 3] for i in range(0, len(buttons), 3)])
 
     if details.get("cover_url"):
         return await _safe_reply_photo(update, context, details["cover_url"], caption, keyboard)
@@ -132,8 +127,6 @@ async def choose_format_callback(update: Update, context: ContextTypes.DEFAULT_T
     """
     Обрабатывает выбор формата книги пользователем и отправляет файл книги.
     """
-    await set_upload_document_action(update, context)
-
     query = update.callback_query
     if not query:
         logger.error("choose_format_callback: callback_query отсутствует")
@@ -141,8 +134,8 @@ async def choose_format_callback(update: Update, context: ContextTypes.DEFAULT_T
 
     try:
         await query.answer()
-    except Exception as e:
-        logger.exception("Ошибка при query.answer(): %s", e)
+    except TelegramError as e:
+        logger.warning("Ошибка при query.answer(): %s", e)
 
     data = (query.data or "").strip()
     parts = data.split("|")
@@ -155,6 +148,11 @@ async def choose_format_callback(update: Update, context: ContextTypes.DEFAULT_T
 
     _, book_id, fmt = parts
 
+    # Детали (для имени файла) запрашиваем параллельно со скачиванием: обычно они уже в кэше
+    # после показа карточки, а если нет — не ждём их последовательно после файла.
+    logger.info("Получение деталей книги %s", book_id)
+    details_task = asyncio.create_task(get_book_details(book_id))
+
     # 1) Скачиваем файл (с периодическим Chat Action)
     try:
         logger.info("Скачивание книги %s в формате %s", book_id, fmt)
@@ -165,19 +163,21 @@ async def choose_format_callback(update: Update, context: ContextTypes.DEFAULT_T
             action=ChatAction.UPLOAD_DOCUMENT,
             interval=4,
         )
-        if not file_data:
-            raise ValueError("Пустой файл книги.")
         logger.info("Книга %s в формате %s скачана", book_id, fmt)
+    except BookTooLargeError:
+        _discard_task(details_task)
+        await _safe_reply_text(update, context, "Файл слишком большой для отправки в Telegram.")
+        return
     except Exception as e:
         logger.exception("Ошибка скачивания книги %s (%s): %s", book_id, fmt, e)
+        _discard_task(details_task)
         await _safe_reply_text(update, context, "Ошибка скачивания книги.")
         return
 
-    # 2) Получаем детали (для имени файла)
+    # 2) Забираем детали (как правило, уже готовы к этому моменту)
     try:
-        logger.info("Получение деталей книги %s", book_id)
         details = await run_with_periodic_action(
-            get_book_details(book_id),
+            details_task,
             update,
             context,
             action=ChatAction.UPLOAD_DOCUMENT,
@@ -217,7 +217,6 @@ async def choose_format_callback(update: Update, context: ContextTypes.DEFAULT_T
         logger.warning("Ошибка при обработке имени файла '%s': %s", raw_name, e)
         filename = f"book_{book_id}.{fmt}"
 
-    # 5) Отправляем документ
     # 5) Отправляем документ
     chat_id: int | None = None
     if query is not None and query.message is not None and getattr(query.message, "chat", None) is not None:
@@ -4,7 +4,7 @@ import logging
 from telegram import Update
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
-from utils.chat_actions import set_typing_action
+from utils.chat_actions import fire_typing_action
 from utils.state import set_user_ephemeral_mode
 
 logger = logging.getLogger(__name__)
@@ -18,7 +18,7 @@ async def book_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 
     try:
         logger.info("Пользователь %s вызвал команду /book", user_id)
-        await set_typing_action(update, context)
+        fire_typing_action(update, context)
 
         set_user_ephemeral_mode(user_id, "book")
 
@@ -2,7 +2,7 @@ import logging
 from telegram import Update
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
-from utils.chat_actions import set_typing_action
+from utils.chat_actions import fire_typing_action
 from utils.state import set_user_ephemeral_mode
 
 logger = logging.getLogger(__name__)
@@ -16,7 +16,7 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     try:
         logger.info("Пользователь %s вызвал команду /search", user_id)
-        await set_typing_action(update, context)
+        fire_typing_action(update, context)
 
         # Если в set_user_ephemeral_mode вы уже добавили timestamp — просто передаём строку режима.
         # Если нет — можно расширить сигнатуру функции в state.py, но это необязательно.
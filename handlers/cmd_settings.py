@@ -4,6 +4,7 @@ import logging
 import html
 import re
 from enum import Enum, auto
+from functools import lru_cache
 from typing import Union, List, Optional
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery
@@ -15,7 +16,7 @@ from telegram.ext import (
 )
 
 from services.db import get_user_settings, set_user_settings
-from utils.chat_actions import set_typing_action
+from utils.chat_actions import fire_typing_action
 from utils.utils import send_or_edit_message
 
 logger = logging.getLogger(__name__)
@@ -36,15 +37,120 @@ CALLBACK_SET_MODE = "set_mode"
 CALLBACK_SET_BOOK_NAMING = "set_book_naming"
 CALLBACK_BACK_TO_MAIN = "back_to_main"
 
+# (подпись кнопки, значение в БД) — порядок задаёт порядок кнопок
+FORMAT_OPTIONS = (
+    ("спрашивать", "ask"),
+    ("fb2", "fb2"),
+    ("epub", "epub"),
+    ("mobi", "mobi"),
+    ("pdf", "pdf"),
+)
+MODE_OPTIONS = (
+    ("общий", "general"),
+    ("только книги", "book"),
+    ("только авторы", "author"),
+)
+NAMING_OPTIONS = (
+    ("Название книги.формат", "title"),
+    ("Название книги_ID.формат", "title_id"),
+    ("Название книги_Имя автора.формат", "title_author"),
+    ("Название книги_Имя автора_ID.формат", "title_author_id"),
+)
+# значение в БД -> подпись в подменю нейминга
+NAMING_LABELS = {value: label for label, value in NAMING_OPTIONS}
+
 
 def build_inline_keyboard(buttons: List[List[InlineKeyboardButton]]) -> InlineKeyboardMarkup:
     """Формирует инлайн-клавиатуру из матрицы кнопок."""
     return InlineKeyboardMarkup(buttons)
 
 
+# Шаблоны текстов меню: при каждом показе подставляются только текущие значения
+MAIN_MENU_TEXT = (
+    "📌 <b>Настройки</b>\n"
+    "━━━━━━━━━━━━━\n\n"
+    "<b>Предпочитаемый формат:</b>\n <code>{fmt}</code>\n\n"
+    "<b>Режим поиска:</b>\n <code>{mode}</code>\n\n"
+    "<b>Нейминг книг:</b>\n <code>{naming}</code>\n\n"
+    "━━━━━━━━━━━━━\n"
+    "<b>Выберите, что меняем:</b>"
+)
+SUBMENU_TEXT = (
+    "📌 <b>Настройки</b>\n"
+    "━━━━━━━━━━━━━\n\n"
+    "<b>{title}</b>\n\n"
+    "<b>Текущий:</b>\n"
+    "<code>{current}</code>\n\n"
+    "━━━━━━━━━━━━━\n"
+    "<b>Выберите, что меняем:</b>"
+)
+MAIN_MENU_NAMING_DISPLAY = {
+    "title": "Название_книги.формат",
+    "title_id": "Название_книги_ID.формат",
+    "title_author": "Название_книги_Имя_автора.формат",
+    "title_author_id": "Название_книги_Имя_автора_ID.формат",
+}
+
+# Кнопка «Назад» одинакова во всех подменю (разметка неизменяема — делим один объект)
+_BACK_ROW = (InlineKeyboardButton("Назад", callback_data=CALLBACK_BACK_TO_MAIN),)
+
+# Главное меню не зависит от пользователя — одна разметка на все вызовы
+MAIN_MENU_KB = build_inline_keyboard([
+    [InlineKeyboardButton("Формат", callback_data=CALLBACK_SETTINGS_FORMAT)],
+    [InlineKeyboardButton("Режим поиска", callback_data=CALLBACK_SETTINGS_MODE)],
+    [InlineKeyboardButton("Названия книг", callback_data=CALLBACK_SETTINGS_BOOK_NAMING)],
+])
+
+
+@lru_cache(maxsize=16)
+def _format_kb(selected_format: str) -> InlineKeyboardMarkup:
+    """Клавиатура меню формата для выбранного значения (разметка неизменяема — можно переиспользовать)."""
+    keyboard = [
+        [InlineKeyboardButton(f"🔘 {label}" if value == selected_format else label,
+                              callback_data=f"{CALLBACK_SET_FMT}|{label}")]
+        for label, value in FORMAT_OPTIONS
+    ]
+    keyboard.append(_BACK_ROW)
+    return build_inline_keyboard(keyboard)
+
+
+@lru_cache(maxsize=16)
+def _mode_kb(selected_mode: str) -> InlineKeyboardMarkup:
+    """Клавиатура меню режима поиска для выбранного значения."""
+    keyboard = [
+        [InlineKeyboardButton(f"🔘 {label}" if value == selected_mode else label,
+                              callback_data=f"{CALLBACK_SET_MODE}|{value}")]
+        for label, value in MODE_OPTIONS
+    ]
+    keyboard.append(_BACK_ROW)
+    return build_inline_keyboard(keyboard)
+
+
+@lru_cache(maxsize=16)
+def _naming_kb(selected_naming: str) -> InlineKeyboardMarkup:
+    """Клавиатура меню нейминга книг для выбранного значения."""
+    keyboard = [
+        [InlineKeyboardButton(f"🔘 {label}" if value == selected_naming else label,
+                              callback_data=f"{CALLBACK_SET_BOOK_NAMING}|{value}")]
+        for label, value in NAMING_OPTIONS
+    ]
+    keyboard.append(_BACK_ROW)
+    return build_inline_keyboard(keyboard)
+
+
+async def _is_already_selected(user_id: int, key: str, default: str, value: str) -> bool:
+    """True, если пользователь нажал на уже выбранный вариант (тогда не пишем в БД и не перерисовываем меню)."""
+    try:
+        user_settings = await get_user_settings(user_id)
+    except Exception:
+        logger.exception("Ошибка получения настроек пользователя %s", user_id)
+        return False
+    return (user_settings.get(key) or default) == value
+
+
 async def settings_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Обработчик команды /settings: показываем главное меню настроек."""
-    await set_typing_action(update, context)
+    fire_typing_action(update, context)
     user = update.effective_user
     user_id = user.id if user else 0
     await show_main_settings_menu(user_id, update)
@@ -63,37 +169,19 @@ async def show_main_settings_menu(user_id: int, target: Union[Update, CallbackQu
     display_format = "спрашивать" if preferred_format in ("", "ask") else preferred_format
 
     preferred_search_mode = user_settings.get("preferred_search_mode") or "general"
-    mode_options = [("общий", "general"), ("только книги", "book"), ("только авторы", "author")]
-    display_search_mode = next((text for text, mode in mode_options if mode == preferred_search_mode),
+    display_search_mode = next((text for text, mode in MODE_OPTIONS if mode == preferred_search_mode),
                                preferred_search_mode)
 
     preferred_book_naming = user_settings.get("preferred_book_naming") or "title_author"
-    naming_display = {
-        "title": "Название_книги.формат",
-        "title_id": "Название_книги_ID.формат",
-        "title_author": "Название_книги_Имя_автора.формат",
-        "title_author_id": "Название_книги_Имя_автора_ID.формат",
-    }
-    book_naming_display = naming_display.get(preferred_book_naming, "Название_книги_Имя_автора.формат")
-
-    text = (
-        "📌 <b>Настройки</b>\n"
-        "━━━━━━━━━━━━━\n\n"
-        f"<b>Предпочитаемый формат:</b>\n <code>{html.escape(display_format)}</code>\n\n"
-        f"<b>Режим поиска:</b>\n <code>{html.escape(display_search_mode)}</code>\n\n"
-        f"<b>Нейминг книг:</b>\n <code>{html.escape(book_naming_display)}</code>\n\n"
-        "━━━━━━━━━━━━━\n"
-        "<b>Выберите, что меняем:</b>"
-    )
+    book_naming_display = MAIN_MENU_NAMING_DISPLAY.get(preferred_book_naming, MAIN_MENU_NAMING_DISPLAY["title_author"])
 
-    keyboard = [
-        [InlineKeyboardButton("Формат", callback_data=CALLBACK_SETTINGS_FORMAT)],
-        [InlineKeyboardButton("Режим поиска", callback_data=CALLBACK_SETTINGS_MODE)],
-        [InlineKeyboardButton("Названия книг", callback_data=CALLBACK_SETTINGS_BOOK_NAMING)],
-    ]
-    markup = build_inline_keyboard(keyboard)
+    text = MAIN_MENU_TEXT.format(
+        fmt=html.escape(display_format),
+        mode=html.escape(display_search_mode),
+        naming=html.escape(book_naming_display),
+    )
 
-    await send_or_edit_message(target, text, reply_markup=markup)
+    await send_or_edit_message(target, text, reply_markup=MAIN_MENU_KB)
 
 
 # ---------- Book naming ----------
@@ -112,33 +200,11 @@ async def show_book_naming_menu(
 
     current_naming = force_value or user_settings.get("preferred_book_naming") or "title_author"
 
-    naming_options = [
-        ("Название книги.формат", "title"),
-        ("Название книги_ID.формат", "title_id"),
-        ("Название книги_Имя автора.формат", "title_author"),
-        ("Название книги_Имя автора_ID.формат", "title_author_id"),
-    ]
-    naming_mapping = {option_value: display_text for display_text, option_value in naming_options}
-    current_display = naming_mapping.get(current_naming, "Название книги_Имя автора.формат")
-
-    text_top = (
-        "📌 <b>Настройки</b>\n"
-        "━━━━━━━━━━━━━\n\n"
-        "<b>Нейминг книг.</b>\n\n"
-        "<b>Текущий:</b>\n"
-        f"<code>{html.escape(current_display)}</code>\n\n"
-        "━━━━━━━━━━━━━\n"
-        "<b>Выберите, что меняем:</b>"
-    )
+    current_display = NAMING_LABELS.get(current_naming, NAMING_LABELS["title_author"])
 
-    keyboard = []
-    for display_text, option_value in naming_options:
-        is_current = (current_naming == option_value)
-        caption = f"🔘 {display_text}" if is_current else display_text
-        keyboard.append([InlineKeyboardButton(caption, callback_data=f"{CALLBACK_SET_BOOK_NAMING}|{option_value}")])
-    keyboard.append([InlineKeyboardButton("Назад", callback_data=CALLBACK_BACK_TO_MAIN)])
+    text_top = SUBMENU_TEXT.format(title="Нейминг книг.", current=html.escape(current_display))
 
-    await send_or_edit_message(target, text_top, reply_markup=build_inline_keyboard(keyboard))
+    await send_or_edit_message(target, text_top, reply_markup=_naming_kb(current_naming))
 
 
 async def settings_book_naming_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -148,12 +214,16 @@ async def settings_book_naming_callback(update: Update, context: ContextTypes.DE
         logger.warning("settings_book_naming_callback: callback_query is None")
         return SettingsState.BOOK_NAMING_MENU.value
 
-    await query.answer()
     data = query.data or ""
     uid = query.from_user.id
 
     if data.startswith(f"{CALLBACK_SET_BOOK_NAMING}|"):
         option_value = data.split("|", 1)[1]
+        if await _is_already_selected(uid, "preferred_book_naming", "title_author", option_value):
+            await query.answer("Уже выбрано")
+            return SettingsState.BOOK_NAMING_MENU.value
+
+        await query.answer()
         try:
             await set_user_settings(uid, preferred_book_naming=option_value)
         except Exception:
@@ -163,6 +233,7 @@ async def settings_book_naming_callback(update: Update, context: ContextTypes.DE
         await show_book_naming_menu(uid, query, force_value=option_value)
         return SettingsState.BOOK_NAMING_MENU.value
 
+    await query.answer()
     if data == CALLBACK_BACK_TO_MAIN:
         await show_main_settings_menu(uid, update)
         return SettingsState.MAIN_MENU.value
@@ -187,26 +258,9 @@ async def show_format_menu(
     selected_format = force_value or user_settings.get("preferred_format") or "ask"
     display_value = "спрашивать" if selected_format == "ask" else selected_format
 
-    text_top = (
-        "📌 <b>Настройки</b>\n"
-        "━━━━━━━━━━━━━\n\n"
-        "<b>Предпочитаемый формат.</b>\n\n"
-        "<b>Текущий:</b>\n"
-        f"<code>{html.escape(display_value)}</code>\n\n"
-        "━━━━━━━━━━━━━\n"
-        "<b>Выберите, что меняем:</b>"
-    )
-
-    format_options = ["спрашивать", "fb2", "epub", "mobi", "pdf"]
-    keyboard = []
-    for option in format_options:
-        option_value = "ask" if option == "спрашивать" else option
-        is_current = (option_value == selected_format)
-        caption = f"🔘 {option}" if is_current else option
-        keyboard.append([InlineKeyboardButton(caption, callback_data=f"{CALLBACK_SET_FMT}|{option}")])
-    keyboard.append([InlineKeyboardButton("Назад", callback_data=CALLBACK_BACK_TO_MAIN)])
+    text_top = SUBMENU_TEXT.format(title="Предпочитаемый формат.", current=html.escape(display_value))
 
-    await send_or_edit_message(target, text_top, reply_markup=build_inline_keyboard(keyboard))
+    await send_or_edit_message(target, text_top, reply_markup=_format_kb(selected_format))
 
 
 async def settings_format_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -216,13 +270,17 @@ async def settings_format_callback(update: Update, context: ContextTypes.DEFAULT
         logger.warning("settings_format_callback: callback_query is None")
         return SettingsState.FORMAT_MENU.value
 
-    await query.answer()
     data = query.data or ""
     uid = query.from_user.id
 
     if data.startswith(f"{CALLBACK_SET_FMT}|"):
         option = data.split("|", 1)[1]
         new_format = "ask" if option == "спрашивать" else option
+        if await _is_already_selected(uid, "preferred_format", "ask", new_format):
+            await query.answer("Уже выбрано")
+            return SettingsState.FORMAT_MENU.value
+
+        await query.answer()
         try:
             await set_user_settings(uid, preferred_format=new_format)
         except Exception:
@@ -231,6 +289,7 @@ async def settings_format_callback(update: Update, context: ContextTypes.DEFAULT
         await show_format_menu(uid, query, force_value=new_format)
         return SettingsState.FORMAT_MENU.value
 
+    await query.answer()
     if data == CALLBACK_BACK_TO_MAIN:
         await show_main_settings_menu(uid, update)
         return SettingsState.MAIN_MENU.value
@@ -253,27 +312,11 @@ async def show_mode_menu(
         user_settings = {}
 
     selected_mode = force_value or user_settings.get("preferred_search_mode") or "general"
-    mode_options = [("общий", "general"), ("только книги", "book"), ("только авторы", "author")]
-    display_mode = next((text for text, mode in mode_options if mode == selected_mode), selected_mode)
-
-    text_top = (
-        "📌 <b>Настройки</b>\n"
-        "━━━━━━━━━━━━━\n\n"
-        "<b>Режим поиска.</b>\n\n"
-        "<b>Текущий:</b>\n"
-        f"<code>{html.escape(display_mode)}</code>\n\n"
-        "━━━━━━━━━━━━━\n"
-        "<b>Выберите, что меняем:</b>"
-    )
+    display_mode = next((text for text, mode in MODE_OPTIONS if mode == selected_mode), selected_mode)
 
-    keyboard = []
-    for display_text, option_value in mode_options:
-        is_current = (option_value == selected_mode)
-        caption = f"🔘 {display_text}" if is_current else display_text
-        keyboard.append([InlineKeyboardButton(caption, callback_data=f"{CALLBACK_SET_MODE}|{option_value}")])
-    keyboard.append([InlineKeyboardButton("Назад", callback_data=CALLBACK_BACK_TO_MAIN)])
+    text_top = SUBMENU_TEXT.format(title="Режим поиска.", current=html.escape(display_mode))
 
-    await send_or_edit_message(target, text_top, reply_markup=build_inline_keyboard(keyboard))
+    await send_or_edit_message(target, text_top, reply_markup=_mode_kb(selected_mode))
 
 
 async def settings_mode_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -283,12 +326,16 @@ async def settings_mode_callback(update: Update, context: ContextTypes.DEFAULT_T
         logger.warning("settings_mode_callback: callback_query is None")
         return SettingsState.MODE_MENU.value
 
-    await query.answer()
     data = query.data or ""
     uid = query.from_user.id
 
     if data.startswith(f"{CALLBACK_SET_MODE}|"):
         option_value = data.split("|", 1)[1]
+        if await _is_already_selected(uid, "preferred_search_mode", "general", option_value):
+            await query.answer("Уже выбрано")
+            return SettingsState.MODE_MENU.value
+
+        await query.answer()
         try:
             await set_user_settings(uid, preferred_search_mode=option_value)
         except Exception:
@@ -296,6 +343,7 @@ async def settings_mode_callback(update: Update, context: ContextTypes.DEFAULT_T
         await show_mode_menu(uid, query, force_value=option_value)
         return SettingsState.MODE_MENU.value
 
+    await query.answer()
     if data == CALLBACK_BACK_TO_MAIN:
         await show_main_settings_menu(uid, update)
         return SettingsState.MAIN_MENU.value
@@ -331,6 +379,31 @@ async def settings_main_menu_callback(update: Update, context: ContextTypes.DEFA
 
 # ---------- Conversation handler ----------
 
+_SETTINGS_CALLBACKS = (
+    CALLBACK_SETTINGS_FORMAT,
+    CALLBACK_SETTINGS_MODE,
+    CALLBACK_SETTINGS_BOOK_NAMING,
+    CALLBACK_SET_FMT,
+    CALLBACK_SET_MODE,
+    CALLBACK_SET_BOOK_NAMING,
+    CALLBACK_BACK_TO_MAIN,
+)
+
+
+def is_settings_update(update: object) -> bool:
+    """
+    True для апдейтов, которые может обработать диалог /settings: сама команда и нажатия
+    в его меню. Такие апдейты одного пользователя обрабатываются строго последовательно.
+    """
+    if not isinstance(update, Update):
+        return False
+    if update.callback_query is not None:
+        return (update.callback_query.data or "").startswith(_SETTINGS_CALLBACKS)
+    if update.message is not None and update.message.text:
+        return update.message.text.startswith("/settings")
+    return False
+
+
 def get_settings_conversation_handler() -> ConversationHandler:
     """
     Конструктор ConversationHandler для /settings.
@@ -2,11 +2,24 @@
 
 import logging
 from telegram import Update
+from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
-from utils.chat_actions import set_typing_action
+from utils.chat_actions import fire_typing_action
 
 logger = logging.getLogger(__name__)
 
+START_TEXT = (
+    "<b>Привет! Я бот для поиска книг на Флибусте.</b>\n"
+    "━━━━━━━━━━━━━\n\n"
+    "Просто напиши в чат <u>название книги</u> или <u>имя автора</u>, и я поищу!\n\n"
+    "<b>Доступные команды:</b>\n"
+    "• <b>Настройки:</b> <i>/settings</i>\n"
+    "• <b>Общий поиск:</b> <i>/search</i>\n"
+    "• <b>Поиск книг:</b> <i>/book</i>\n"
+    "• <b>Поиск авторов:</b> <i>/author</i>\n\n"
+    "━━━━━━━━━━━━━"
+)
+
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -17,22 +30,10 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         logger.info("Пользователь %s вызвал команду /start", user_id)
-        await set_typing_action(update, context)
-
-        start_text = (
-            "<b>Привет! Я бот для поиска книг на Флибусте.</b>\n"
-            "━━━━━━━━━━━━━\n\n"
-            "Просто напиши в чат <u>название книги</u> или <u>имя автора</u>, и я поищу!\n\n"
-            "<b>Доступные команды:</b>\n"
-            "• <b>Настройки:</b> <i>/settings</i>\n"
-            "• <b>Общий поиск:</b> <i>/search</i>\n"
-            "• <b>Поиск книг:</b> <i>/book</i>\n"
-            "• <b>Поиск авторов:</b> <i>/author</i>\n\n"
-            "━━━━━━━━━━━━━"
-        )
+        fire_typing_action(update, context)
 
         if update.message:
-            return await update.message.reply_text(start_text, parse_mode="HTML")
+            return await update.message.reply_text(START_TEXT, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
         else:
             logger.warning("Не удалось отправить /start пользователю %s: в update нет message", user_id)
 
@@ -1,5 +1,6 @@
 # handlers/message_handler.py
 
+import asyncio
 import logging
 import re
 from typing import Optional
@@ -7,13 +8,14 @@ from typing import Optional
 from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.constants import ChatAction
+from telegram.error import TelegramError
 
-from services.service import search_books_and_authors, get_book_details, download_book
+from services.service import BookTooLargeError, search_books_and_authors, get_book_details, download_book
 from services.db import get_user_settings
-from config import SEARCH_RESULTS_PER_PAGE
-from utils.chat_actions import set_typing_action, run_with_periodic_action
-from utils.pagination import build_page_text, build_pagination_kb
-from handlers.author_handler import author_books_command
+from config import MAX_TITLE_LENGTH
+from utils.chat_actions import run_with_periodic_action
+from utils.pagination import build_page_text, build_pagination_kb, build_pages_text
+from handlers.author_handler import AUTHOR_CMD_RE, author_books_command
 from handlers.book_handler import send_book_details_message
 from utils.state import (
     set_author_mapping,
@@ -21,10 +23,13 @@ from utils.state import (
     get_user_ephemeral_mode,
     clear_user_ephemeral_mode,
 )
-from utils.utils import send_or_edit_message
+from utils.utils import send_or_edit_message, sanitize_filename, shorten_title
+from utils.stats import record_query
 
 logger = logging.getLogger(__name__)
 
+_DOWNLOAD_CMD_RE = re.compile(r"^/download(\d+)$", re.IGNORECASE)
+
 
 async def _safe_reply_text(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str) -> None:
     """Пытается отправить текст пользователю вне зависимости от наличия message."""
@@ -41,6 +46,14 @@ async def _safe_reply_text(update: Update, context: ContextTypes.DEFAULT_TYPE, t
         logger.warning("Не удалось отправить сообщение пользователю: %s", e)
 
 
+async def _await_card(card_task: "asyncio.Task[int]", book_id: str) -> None:
+    """Дожидается отправки карточки; её сбой не должен мешать отправке самого файла."""
+    try:
+        await card_task
+    except TelegramError:
+        logger.exception("Не удалось отправить карточку книги %s", book_id)
+
+
 async def handle_download_command(book_id: str, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Загрузка книги по ID: учитывает preferred_format, шлёт карточку + файл (если доступен)."""
     if not book_id.isdigit():
@@ -68,6 +81,8 @@ async def handle_download_command(book_id: str, update: Update, context: Context
 
     # если формат задан и доступен — качаем файл
     if preferred_format and preferred_format in details.get("formats", []):
+        # Карточку отправляем всегда и сразу — параллельно со скачиванием файла
+        card_task = asyncio.create_task(send_book_details_message(update, context, details))
         try:
             logger.info("Скачивание книги %s в формате %s", book_id, preferred_format)
             file_data = await run_with_periodic_action(
@@ -77,19 +92,32 @@ async def handle_download_command(book_id: str, update: Update, context: Context
                 action=ChatAction.UPLOAD_DOCUMENT,
                 interval=4,
             )
-            # карточку отправляем всегда
-            await send_book_details_message(update, context, details)
+        except BookTooLargeError:
+            logger.warning("Книга %s (%s) слишком большая для отправки", book_id, preferred_format)
+            await _await_card(card_task, book_id)
+            await _safe_reply_text(update, context, "Файл слишком большой для отправки в Telegram.")
+            return
+        except Exception:
+            logger.exception("Ошибка при скачивании книги")
+            await _await_card(card_task, book_id)
+            await _safe_reply_text(update, context, "Ошибка скачивания книги.")
+            return
+
+        # Файл — строго после карточки, чтобы порядок сообщений в чате не менялся
+        await _await_card(card_task, book_id)
 
-            chat_id = update.effective_chat.id if update.effective_chat else user_id
+        title = shorten_title(details.get("title") or "book", MAX_TITLE_LENGTH)
+        chat_id = update.effective_chat.id if update.effective_chat else user_id
+        try:
             await context.bot.send_document(
                 chat_id=chat_id,
                 document=file_data,
-                filename=f"{details.get('title','book')[:50]}_{book_id}.{preferred_format}",
+                filename=f"{sanitize_filename(title) or 'book'}_{book_id}.{preferred_format}",
                 caption=f"{details.get('title','')}\nАвтор: {details.get('author','')}",
             )
         except Exception:
-            logger.exception("Ошибка при скачивании книги")
-            await send_book_details_message(update, context, details)
+            logger.exception("Ошибка при отправке книги %s пользователю %s", book_id, chat_id)
+            await _safe_reply_text(update, context, "Ошибка при отправке файла.")
     else:
         await send_book_details_message(update, context, details)
 
@@ -99,19 +127,19 @@ def _build_response_lines(books: list, authors: list) -> list[str]:
     lines: list[str] = []
     if authors:
         lines.append(f"📖 <b>Найдено авторов:</b> {len(authors)}\n")
-        for a in authors:
-            lines.append(
-                f"• <b>{a['name']}</b> — {a['book_count']} книг\n"
-                f"  <u>/author{a['id']}</u>\n\n"
-            )
+        lines.extend(
+            f"• <b>{a['name']}</b> — {a['book_count']} книг\n"
+            f"  <u>/author{a['id']}</u>\n\n"
+            for a in authors
+        )
     if books:
         lines.append(f"📚 <b>Найдено книг:</b> {len(books)}\n")
-        for b in books:
-            lines.append(
-                f"• <b>{b['title']}</b>\n"
-                f"  Автор: <i>{b['author']}</i>\n"
-                f"  Скачать: <u>/download{b['id']}</u>\n\n"
-            )
+        lines.extend(
+            f"• <b>{b['title']}</b>\n"
+            f"  Автор: <i>{b['author']}</i>\n"
+            f"  Скачать: <u>/download{b['id']}</u>\n\n"
+            for b in books
+        )
     return lines
 
 
@@ -121,9 +149,8 @@ async def text_message_handler(update: Update, context: ContextTypes.DEFAULT_TYP
     - /download<ID>[@...]
     - /author<ID>[@...]
     - текстовый поиск
+    Chat action «печатает…» шлёт run_with_periodic_action вокруг сетевых запросов.
     """
-    await set_typing_action(update, context)
-
     if update.message is None or update.message.text is None:
         await _safe_reply_text(update, context, "Я понимаю только текстовые сообщения.")
         return
@@ -138,18 +165,23 @@ async def text_message_handler(update: Update, context: ContextTypes.DEFAULT_TYP
     user_id = user.id if user else 0
     chat_id = chat.id if chat else 0
     logger.info("%s:%s -> %s", user_id, chat_id, text)
+    record_query(user_id, chat_id, text)
 
-    # --- /download<ID> ---
-    m = re.match(r"^/download(\d+)$", text, re.IGNORECASE)
-    if m:
-        book_id = m.group(1)
-        await handle_download_command(book_id, update, context)
-        return
+    # Обычный текст (самый частый случай) сразу идёт в поиск, без проверки команд
+    if text.startswith("/"):
+        # --- /download<ID> ---
+        if m := _DOWNLOAD_CMD_RE.match(text):
+            await handle_download_command(m.group(1), update, context)
+            return
 
-    # --- /author<ID> ---
-    if text.lower().startswith("/author"):
-        await author_books_command(update, context)
-        return
+        # --- /author<ID> ---
+        if m := AUTHOR_CMD_RE.match(text):
+            await author_books_command(update, context, author_id=m.group(1))
+            return
+        if text[:7].lower() == "/author":
+            # некорректный ID — author_books_command сам ответит подсказкой
+            await author_books_command(update, context)
+            return
 
     # --- Поиск ---
     try:
@@ -183,8 +215,7 @@ async def text_message_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         return
 
     lines = _build_response_lines(books, authors)
-    total_pages = max(1, (len(lines) + SEARCH_RESULTS_PER_PAGE - 1) // SEARCH_RESULTS_PER_PAGE)
-    set_user_search_data(user_id, lines, total_pages)
+    set_user_search_data(user_id, build_pages_text(lines))
 
     page_text = build_page_text(user_id)
     kb = build_pagination_kb(user_id)
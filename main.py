@@ -31,11 +31,24 @@ from telegram.ext import (
     AIORateLimiter,  # ⬅️ рейт-лимитер
 )
 
-from config import ADMIN_ID, LOG_FILE, STATS_FILE, SEND_REPORT_TIME
-from services.db import init_db
-from services.service import init_session
+from config import (
+    ADMIN_ID,
+    LOG_FILE,
+    STATS_FILE,
+    SEND_REPORT_TIME,
+    WEBHOOK_URL,
+    WEBHOOK_LISTEN,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    TG_OVERALL_MAX_RATE,
+    TG_GROUP_MAX_RATE,
+    TG_MAX_RETRIES,
+)
+from services.db import init_db, close_db, cleanup_settings_cache
+from services.service import init_session, close_session
 
-from handlers.cmd_settings import get_settings_conversation_handler
+from handlers.cmd_settings import get_settings_conversation_handler, is_settings_update
 from handlers.cmd_search import search_command
 from handlers.cmd_author import author_command
 from handlers.cmd_start import start_command
@@ -46,7 +59,9 @@ from handlers.book_handler import choose_format_callback
 from utils.pagination import pagination_callback_handler
 from utils.utils import no_op_callback
 from utils.state import cleanup_old_data
+from utils.stats import stats_writer, flush_stats
 from utils.whitelist import whitelist_required, process_whitelist
+from utils.update_processor import PerUserSerialUpdateProcessor
 
 
 def setup_logging():
@@ -81,9 +96,27 @@ BOT_COMMANDS = [
 ]
 
 
+# Фоновые задачи, запущенные в post_init (гасим в post_shutdown)
+_background_tasks: list[asyncio.Task] = []
+
+
 async def _post_init(app: Application) -> None:
-    """Вызывается Application'ом после инициализации — выставляем команды бота."""
+    """Вызывается Application'ом после инициализации — выставляем команды бота и запускаем фоновые задачи."""
+    # HTTP-сессию к Флибусте создаём уже на цикле, который будет обслуживать апдейты
+    await init_session()
     await app.bot.set_my_commands(BOT_COMMANDS)
+    _background_tasks.append(asyncio.create_task(stats_writer()))
+
+
+async def _post_shutdown(app: Application) -> None:
+    """Вызывается Application'ом при остановке — закрываем долгоживущие ресурсы."""
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+    await flush_stats()
+    await close_session()
+    await close_db()
 
 
 async def send_logs_to_admin(application: Application):
@@ -157,7 +190,6 @@ def main():
     setup_logging()
     logging.info("Инициализация БД...")
     loop.run_until_complete(init_db())
-    loop.run_until_complete(init_session())
 
     TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
     if not TELEGRAM_TOKEN:
@@ -167,9 +199,20 @@ def main():
     application = (
         ApplicationBuilder()
         .token(TELEGRAM_TOKEN)
-        .concurrent_updates(32)
-        .rate_limiter(AIORateLimiter())  # ⬅️ включаем рейт-лимитер (дефолтные безопасные лимиты)
+        # Апдейты обрабатываются параллельно, кроме диалога /settings — он по одному на пользователя
+        .concurrent_updates(PerUserSerialUpdateProcessor(32, is_serial=is_settings_update))
+        # ⬅️ рейт-лимитер: сглаживает всплески под лимиты Telegram и повторяет запрос при RetryAfter
+        .rate_limiter(
+            AIORateLimiter(
+                overall_max_rate=TG_OVERALL_MAX_RATE,
+                overall_time_period=1,
+                group_max_rate=TG_GROUP_MAX_RATE,
+                group_time_period=60,
+                max_retries=TG_MAX_RETRIES,
+            )
+        )
         .post_init(_post_init)
+        .post_shutdown(_post_shutdown)
         .build()
     )
 
@@ -207,6 +250,7 @@ def main():
     scheduler = AsyncIOScheduler(timezone="UTC", event_loop=loop)
     scheduler.add_job(send_logs_to_admin, trigger="cron", hour=hour, minute=minute, args=[application])
     scheduler.add_job(cleanup_old_data, trigger="interval", minutes=10)
+    scheduler.add_job(cleanup_settings_cache, trigger="interval", minutes=10)
     scheduler.start()
 
     # --- Graceful shutdown: корректно гасим планировщик при выходе ---
@@ -223,11 +267,27 @@ def main():
             except Exception:
                 pass
 
-    logging.info("Запуск бота...")
-    application.run_polling(
-        drop_pending_updates=True,
-        allowed_updates=["message", "callback_query"],  # берём только то, что реально используем
-    )
+    allowed_updates = ["message", "callback_query"]  # берём только то, что реально используем
+
+    if WEBHOOK_URL:
+        url_path = WEBHOOK_PATH.strip("/") or TELEGRAM_TOKEN
+        logging.info("Запуск бота (webhook на %s:%s)...", WEBHOOK_LISTEN, WEBHOOK_PORT)
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=url_path,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{url_path}",
+            secret_token=WEBHOOK_SECRET or None,
+            drop_pending_updates=True,
+            allowed_updates=allowed_updates,
+        )
+    else:
+        logging.info("Запуск бота (long polling)...")
+        application.run_polling(
+            timeout=30,  # long polling: Telegram держит getUpdates открытым до 30 с
+            drop_pending_updates=True,
+            allowed_updates=allowed_updates,
+        )
 
 
 if __name__ == "__main__":
@@ -1,10 +1,11 @@
 import aiosqlite
 import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 
-from config import DB_PATH
+from config import DB_PATH, DATA_EXPIRATION_TIME
 
 logger = logging.getLogger(__name__)
 
@@ -54,14 +55,20 @@ class DBPool:
         conn = await aiosqlite.connect(self.db_path)
         conn.row_factory = aiosqlite.Row
         try:
-            # WAL — для параллельных читателей
-            await conn.execute("PRAGMA journal_mode=WAL;")
+            # WAL — для параллельных читателей (для :memory: не имеет смысла)
+            if self.db_path != ":memory:":
+                await conn.execute("PRAGMA journal_mode=WAL;")
+                # Авточекапойнт, чтобы wal не разрастался.
+                # При росте нагрузки можно добавить периодический PRAGMA wal_checkpoint(TRUNCATE).
+                await conn.execute("PRAGMA wal_autocheckpoint=1000;")
             # Дадим SQLite подождать подольше вместо мгновенного 'database is locked'
             await conn.execute("PRAGMA busy_timeout=10000;")    # 10 сек
             # Компромисс скорость/надёжность
             await conn.execute("PRAGMA synchronous=NORMAL;")
-            # Авточекапойнт, чтобы wal не разрастался
-            await conn.execute("PRAGMA wal_autocheckpoint=1000;")
+            # Временные таблицы/индексы — в памяти, кэш страниц ~64 МБ, mmap до 256 МБ
+            await conn.execute("PRAGMA temp_store=MEMORY;")
+            await conn.execute("PRAGMA cache_size=-65536;")
+            await conn.execute("PRAGMA mmap_size=268435456;")
             await conn.commit()
         except Exception:
             # Не фатально, просто логируем
@@ -87,7 +94,10 @@ class DBPool:
         Быстрая проверка, что соединение «живое».
         """
         try:
-            await conn.execute("PRAGMA user_version;")
+            # Курсор обязательно закрываем: незавершённый statement держит
+            # read-снапшот WAL, и соединение перестаёт видеть чужие коммиты.
+            cursor = await conn.execute("PRAGMA user_version;")
+            await cursor.close()
             return True
         except Exception:
             return False
@@ -195,20 +205,81 @@ db_pool = DBPool(DB_PATH, min_pool_size=2, max_pool_size=2, get_timeout=5.0)
 
 # ========= Инициализация БД =========
 
+_AUTO_VACUUM_INCREMENTAL = 2
+
+
+async def _ensure_incremental_auto_vacuum(conn: aiosqlite.Connection) -> None:
+    """
+    Переводит БД в auto_vacuum=INCREMENTAL, чтобы освобождённые страницы можно было
+    возвращать порциями (PRAGMA incremental_vacuum) без полного VACUUM.
+    Для уже существующего файла режим вступает в силу только после одного VACUUM.
+    """
+    cursor = await conn.execute("PRAGMA auto_vacuum;")
+    row = await cursor.fetchone()
+    await cursor.close()
+    if row and row[0] == _AUTO_VACUUM_INCREMENTAL:
+        return
+
+    await conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+    await conn.execute("VACUUM;")
+    logger.info("SQLite переведена в режим auto_vacuum=INCREMENTAL.")
+
+
 async def init_db() -> None:
     """
-    Применяет миграции/DDL и прогревает пул.
+    Прогревает пул и применяет миграции/DDL через соединение из него же,
+    без отдельного одноразового коннекта.
     """
+    await db_pool.init_pool()
+
     try:
-        async with aiosqlite.connect(DB_PATH) as db:
-            await db.executescript(INIT_SCRIPT)
-            await db.commit()
+        async with db_pool.connection() as conn:
+            async with db_pool.write_lock:
+                await _ensure_incremental_auto_vacuum(conn)
+                await conn.executescript(INIT_SCRIPT)
+                await conn.commit()
         logger.info("База данных успешно инициализирована.")
     except Exception:
         logger.exception("Ошибка при инициализации базы данных")
         raise
 
-    await db_pool.init_pool()
+
+async def close_db() -> None:
+    """
+    Закрывает соединения пула (вызывается при остановке приложения).
+    Перед закрытием обновляет статистику планировщика (PRAGMA optimize)
+    и возвращает до 100 свободных страниц.
+    """
+    try:
+        async with db_pool.connection() as conn:
+            async with db_pool.write_lock:
+                # Каждый шаг прагмы освобождает одну страницу, а execute шагает один раз —
+                # executescript выполняет её до конца
+                await conn.executescript("PRAGMA incremental_vacuum(100);")
+                await conn.execute("PRAGMA optimize;")
+                await conn.commit()
+    except Exception:
+        logger.warning("Не удалось выполнить обслуживание SQLite перед закрытием", exc_info=True)
+
+    await db_pool.close()
+
+
+# ========= Кэш настроек =========
+
+# user_id -> (time.monotonic() момента записи, настройки)
+_settings_cache: Dict[int, Tuple[float, Dict[str, Optional[str]]]] = {}
+# Счётчик записей: чтение, начавшееся до UPSERT, не должно положить в кэш устаревшие данные
+_settings_writes: int = 0
+
+
+async def cleanup_settings_cache() -> None:
+    """Удаляет из кэша настройки старше DATA_EXPIRATION_TIME."""
+    now = time.monotonic()
+    expired = [uid for uid, (ts, _) in list(_settings_cache.items()) if now - ts >= DATA_EXPIRATION_TIME]
+    for uid in expired:
+        _settings_cache.pop(uid, None)
+    if expired:
+        logger.debug("Из кэша настроек удалено записей: %d.", len(expired))
 
 
 # ========= CRUD для user_settings =========
@@ -217,7 +288,13 @@ async def get_user_settings(user_id: int) -> Dict[str, Optional[str]]:
     """
     Возвращает словарь с настройками пользователя.
     Отсутствующие значения — None.
+    Результат кэшируется на DATA_EXPIRATION_TIME и сбрасывается в set_user_settings.
     """
+    cached = _settings_cache.get(user_id)
+    if cached and time.monotonic() - cached[0] < DATA_EXPIRATION_TIME:
+        return dict(cached[1])
+
+    writes_before = _settings_writes
     async with db_pool.connection() as conn:
         try:
             cursor = await conn.execute(
@@ -236,12 +313,17 @@ async def get_user_settings(user_id: int) -> Dict[str, Optional[str]]:
             raise
 
     if row:
-        return {
+        settings: Dict[str, Optional[str]] = {
             "preferred_format": row["preferred_format"],
             "preferred_search_mode": row["preferred_search_mode"],
             "preferred_book_naming": row["preferred_book_naming"],
         }
-    return {"preferred_format": None, "preferred_search_mode": None, "preferred_book_naming": None}
+    else:
+        settings = {"preferred_format": None, "preferred_search_mode": None, "preferred_book_naming": None}
+
+    if writes_before == _settings_writes:
+        _settings_cache[user_id] = (time.monotonic(), settings)
+    return dict(settings)
 
 
 async def set_user_settings(
@@ -252,7 +334,9 @@ async def set_user_settings(
 ) -> None:
     """
     UPSERT без предварительного SELECT. Если параметр None — оставляем прежнее значение (COALESCE).
+    После записи сбрасывает кэш настроек пользователя.
     """
+    global _settings_writes
     async with db_pool.connection() as conn:
         # Сериализуем операции записи
         async with db_pool.write_lock:
@@ -273,3 +357,6 @@ async def set_user_settings(
             except Exception:
                 logger.exception("Ошибка при UPSERT настроек пользователя")
                 raise
+            finally:
+                _settings_writes += 1
+                _settings_cache.pop(user_id, None)
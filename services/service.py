@@ -1,14 +1,24 @@
 # services/service.py
 
 import asyncio
+import copy
 import time
 import aiohttp
 import re
 import logging
-from typing import Any, Dict, List, Optional, Callable
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
 
 from bs4 import BeautifulSoup, Tag
-from config import FLIBUSTA_MIRRORS, RATE_LIMIT_RPS, FETCH_TIMEOUT_SECONDS
+from cachetools import TTLCache
+
+from config import (
+    FLIBUSTA_MIRRORS,
+    RATE_LIMIT_RPS,
+    FETCH_TIMEOUT_SECONDS,
+    DOWNLOAD_MAX_BYTES,
+    SCRAPE_CACHE_TTL,
+    SEARCH_CACHE_TTL,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -29,10 +39,46 @@ _DEFAULT_TIMEOUT = aiohttp.ClientTimeout(
     sock_read=FETCH_TIMEOUT_SECONDS,
 )
 _DEFAULT_HEADERS = {"User-Agent": "FlibustaBot/1.0 (+https://t.me/your_bot)"}
+_DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Регулярки парсера компилируем один раз
+_TRAILING_PARENS_RE = re.compile(r"\([^)]+\)$")  # «Название (fb2)» -> «Название»
+_BOOK_COUNT_RE = re.compile(r"\((\d+)\s*книг")
+_EDITION_YEAR_RE = re.compile(r"издание\s+(\d{4})\s*(года|г\.)", re.IGNORECASE)
+_BOOK_HREF_RE = re.compile(r"^/b/\d+$")
+
+# Кэш распарсенных страниц: популярные книги/авторы не качаем заново для каждого пользователя.
+# Наружу всегда отдаём глубокую копию — вызывающие правят словари/списки на месте.
+_details_cache: "TTLCache[str, Dict[str, Any]]" = TTLCache(maxsize=5000, ttl=SCRAPE_CACHE_TTL)
+_author_books_cache: "TTLCache[tuple, List[Dict[str, Any]]]" = TTLCache(maxsize=2000, ttl=SCRAPE_CACHE_TTL)
+_search_cache: "TTLCache[tuple, Dict[str, Any]]" = TTLCache(maxsize=2000, ttl=SEARCH_CACHE_TTL)
+
+# Запросы «в полёте»: одинаковые одновременные вызовы ждут одну и ту же задачу
+_inflight: Dict[tuple, "asyncio.Future[Any]"] = {}
+
+T = TypeVar("T")
 
 
 # --------- Вспомогательные хелперы ---------
 
+async def _coalesce(key: tuple, factory: Callable[[], Awaitable[T]]) -> T:
+    """
+    Single-flight: если запрос с тем же ключом уже выполняется — ждём его результат,
+    иначе запускаем factory(). Отмена одного ожидающего не отменяет общий запрос.
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        _inflight[key] = task
+
+        def _forget(t: "asyncio.Future[Any]") -> None:
+            if _inflight.get(key) is t:
+                del _inflight[key]
+
+        task.add_done_callback(_forget)
+    return await asyncio.shield(task)
+
+
 def _href_startswith(prefix: str) -> Callable[[Optional[str]], bool]:
     """Typed-предикат для BeautifulSoup href=..."""
     def _pred(x: Optional[str]) -> bool:
@@ -62,7 +108,18 @@ def _str_attr(tag: Tag, name: str) -> str:
 async def _ensure_session() -> aiohttp.ClientSession:
     global _session
     if _session is None or _session.closed:
-        _session = aiohttp.ClientSession(timeout=_DEFAULT_TIMEOUT, headers=_DEFAULT_HEADERS)
+        # Один пул соединений на процесс: keep-alive к зеркалам вместо нового TCP/TLS на запрос
+        connector = aiohttp.TCPConnector(
+            limit=20,
+            limit_per_host=8,     # не душим одно зеркало и не упираемся в общий лимит
+            ttl_dns_cache=300,    # DNS зеркал кэшируем на 5 минут
+            keepalive_timeout=60,
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=_DEFAULT_TIMEOUT,
+            headers=_DEFAULT_HEADERS,
+        )
     return _session
 
 
@@ -156,7 +213,32 @@ async def fetch_url_with_penalty(
 
 # --------- Бизнес-логика ---------
 
+def _search_key(query: str, mode: str) -> tuple:
+    """Ключ кэша поиска: регистр и лишние пробелы на результат Флибусты не влияют."""
+    return (" ".join(query.split()).casefold(), mode)
+
+
 async def search_books_and_authors(query: str, mode: str = "general") -> Dict[str, Any]:
+    """
+    Поиск книг и авторов (результат кэшируется на SEARCH_CACHE_TTL по нормализованному запросу).
+    Пустой результат не кэшируем: это может быть страница ошибки или капчи от зеркала.
+    """
+    key = _search_key(query, mode)
+    cached = _search_cache.get(key)
+    if cached is not None:
+        logger.debug("search cache hit: %r (%s)", key[0], mode)
+        return copy.deepcopy(cached)
+
+    async def _load() -> Dict[str, Any]:
+        data = await _fetch_search(query, mode)
+        if data.get("books_found") or data.get("authors_found"):
+            _search_cache[key] = data
+        return data
+
+    return copy.deepcopy(await _coalesce(("search",) + key, _load))
+
+
+async def _fetch_search(query: str, mode: str) -> Dict[str, Any]:
     params: Dict[str, Any] = {"ask": query}
     if mode in ("general", "book"):
         params["chb"] = "on"
@@ -186,7 +268,7 @@ async def search_books_and_authors(query: str, mode: str = "general") -> Dict[st
                 href = _str_attr(a_tag, "href")
                 author_id = href.split("/a/")[-1] if "/a/" in href else "?"
                 txt = _text_clean(li.get_text())
-                mm = re.search(r"\((\d+)\s*книг", txt)
+                mm = _BOOK_COUNT_RE.search(txt)
                 bc = mm.group(1) if mm else "?"
                 aname = _text_clean(a_tag.get_text())
                 data["authors_found"].append({"id": author_id, "name": aname, "book_count": bc})
@@ -206,7 +288,7 @@ async def search_books_and_authors(query: str, mode: str = "general") -> Dict[st
                 if not a_tags:
                     continue
                 raw_title = _text_clean(a_tags[0].get_text())
-                title_clean = re.sub(r"\([^)]+\)$", "", raw_title).strip()
+                title_clean = _TRAILING_PARENS_RE.sub("", raw_title).strip()
                 hrefb = _str_attr(a_tags[0], "href")
                 b_id = hrefb.split("/b/")[-1] if "/b/" in hrefb else "???"
                 auth_list: List[str] = []
@@ -223,6 +305,21 @@ async def search_books_and_authors(query: str, mode: str = "general") -> Dict[st
 
 
 async def get_book_details(book_id: str) -> Dict[str, Any]:
+    """Карточка книги (с кэшем на SCRAPE_CACHE_TTL)."""
+    cached = _details_cache.get(book_id)
+    if cached is not None:
+        logger.debug("get_book_details cache hit: %s", book_id)
+        return copy.deepcopy(cached)
+
+    async def _load() -> Dict[str, Any]:
+        details = await _fetch_book_details(book_id)
+        _details_cache[book_id] = details
+        return details
+
+    return copy.deepcopy(await _coalesce(("details", book_id), _load))
+
+
+async def _fetch_book_details(book_id: str) -> Dict[str, Any]:
     try:
         logger.info("get_book_details start: %s", book_id)
         html = await fetch_url_with_penalty(f"/b/{book_id}", headers=_DEFAULT_HEADERS)
@@ -238,7 +335,7 @@ async def get_book_details(book_id: str) -> Dict[str, Any]:
         h1 = _as_tag(soup.find("h1", class_="title"))
         if h1:
             t = _text_clean(h1.get_text())
-            t = re.sub(r"\([^)]+\)$", "", t).strip()
+            t = _TRAILING_PARENS_RE.sub("", t).strip()
             title = t
 
         a_auth = _as_tag(h1.find_next("a", href=_href_startswith("/a/"))) if h1 else _as_tag(soup.find("a", href=_href_startswith("/a/")))
@@ -252,7 +349,7 @@ async def get_book_details(book_id: str) -> Dict[str, Any]:
                 at = at[:2000] + "..."
             annotation = at
 
-        mm = re.search(r"издание\s+(\d{4})\s*(года|г\.)", html, re.IGNORECASE)
+        mm = _EDITION_YEAR_RE.search(html)
         if mm:
             year = mm.group(1)
 
@@ -296,7 +393,40 @@ async def get_book_details(book_id: str) -> Dict[str, Any]:
         raise
 
 
+class BookTooLargeError(Exception):
+    """Файл книги больше DOWNLOAD_MAX_BYTES — скачивать и отправлять его бессмысленно."""
+
+
+async def _read_body(resp: aiohttp.ClientResponse) -> Optional[bytes]:
+    """
+    Читает тело ответа кусками и возвращает его одним bytes, или None для пустого тела.
+
+    Книга всё равно целиком оказывается в памяти: InputFile в PTB 20.8 читает документ
+    полностью перед отправкой. Поэтому память на загрузку ограничивает только
+    DOWNLOAD_MAX_BYTES — тело больше него обрываем с BookTooLargeError.
+    """
+    if resp.content_length is not None and resp.content_length > DOWNLOAD_MAX_BYTES:
+        raise BookTooLargeError(f"{resp.content_length} bytes: {resp.url}")
+
+    chunks: List[bytes] = []
+    size = 0
+    async for chunk in resp.content.iter_chunked(_DOWNLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > DOWNLOAD_MAX_BYTES:
+            raise BookTooLargeError(f"> {DOWNLOAD_MAX_BYTES} bytes: {resp.url}")
+        chunks.append(chunk)
+    return b"".join(chunks) if size else None
+
+
 async def download_book(book_id: str, fmt: str) -> bytes:
+    """
+    Скачивает книгу и возвращает её содержимое. Одновременные запросы одной книги в одном
+    формате делят одно скачивание (bytes неизменяемы — копировать результат не нужно).
+    """
+    return await _coalesce(("download", book_id, fmt), lambda: _fetch_book_file(book_id, fmt))
+
+
+async def _fetch_book_file(book_id: str, fmt: str) -> bytes:
     paths = [f"/b/{book_id}/{fmt}", f"/b/{book_id}/download?format={fmt}"]
     last_exc: Optional[Exception] = None
     max_retries = 3
@@ -315,8 +445,8 @@ async def download_book(book_id: str, fmt: str) -> bytes:
                 timeout = aiohttp.ClientTimeout(total=timeout_seconds)
                 async with sess.get(url, timeout=timeout) as resp:
                     if resp.status == 200:
-                        content = await resp.read()
-                        if content:
+                        content = await _read_body(resp)
+                        if content is not None:
                             await _decay_penalty(mirror, 1)
                             logger.info("download_book OK: %s", url)
                             return content
@@ -329,6 +459,10 @@ async def download_book(book_id: str, fmt: str) -> bytes:
                         last_exc = Exception(f"HTTP {resp.status} {url}")
                         logger.warning("download_book HTTP %s: %s", resp.status, url)
 
+            except BookTooLargeError:
+                # Размер файла не зависит от зеркала — повторять бессмысленно
+                logger.warning("download_book: файл слишком большой: %s", url)
+                raise
             except asyncio.TimeoutError:
                 await _bump_penalty(mirror, 2)
                 last_exc = Exception(f"Timeout: {url}")
@@ -343,6 +477,23 @@ async def download_book(book_id: str, fmt: str) -> bytes:
 
 
 async def get_author_books(author_id: str, default_author: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Список книг автора (с кэшем на SCRAPE_CACHE_TTL)."""
+    key = (author_id, default_author)
+    cached = _author_books_cache.get(key)
+    if cached is not None:
+        logger.debug("get_author_books cache hit: %s", author_id)
+        return copy.deepcopy(cached)
+
+    async def _load() -> List[Dict[str, Any]]:
+        books = await _fetch_author_books(author_id, default_author)
+        if books:  # пустой ответ может быть временным сбоем зеркала — не запоминаем
+            _author_books_cache[key] = books
+        return books
+
+    return copy.deepcopy(await _coalesce(("author_books",) + key, _load))
+
+
+async def _fetch_author_books(author_id: str, default_author: Optional[str] = None) -> List[Dict[str, Any]]:
     try:
         logger.info("get_author_books start: %s", author_id)
         html = await fetch_url_with_penalty(f"/a/{author_id}", headers=_DEFAULT_HEADERS)
@@ -379,7 +530,7 @@ async def get_author_books(author_id: str, default_author: Optional[str] = None)
                     if not a_tag:
                         continue
                     raw_title = _text_clean(a_tag.get_text())
-                    t_clean = re.sub(r"\([^)]+\)$", "", raw_title).strip()
+                    t_clean = _TRAILING_PARENS_RE.sub("", raw_title).strip()
                     hr = _str_attr(a_tag, "href")
                     b_id = hr.split("/b/")[-1] if "/b/" in hr else "???"
 
@@ -399,7 +550,7 @@ async def get_author_books(author_id: str, default_author: Optional[str] = None)
 
         # --- fallback: собрать все ссылки вида /b/<id> ---
         if not filled:
-            links = soup.find_all("a", href=re.compile(r"^/b/\d+$"))
+            links = soup.find_all("a", href=_BOOK_HREF_RE)
             seen = set()
             for link in links:
                 link = _as_tag(link)
@@ -0,0 +1,31 @@
+"""utils.chat_actions tests — fake bot object, no bot token required."""
+
+import asyncio
+from types import SimpleNamespace
+
+from telegram.constants import ChatAction
+
+from utils import chat_actions
+
+
+def test_concurrent_downloads_in_one_chat_share_one_action_loop():
+    sent = []
+
+    async def send_chat_action(chat_id, action):
+        sent.append((chat_id, action))
+
+    update = SimpleNamespace(effective_chat=SimpleNamespace(id=5))
+    context = SimpleNamespace(application=None, bot=SimpleNamespace(send_chat_action=send_chat_action))
+
+    async def scenario():
+        jobs = [
+            chat_actions.run_with_periodic_action(
+                asyncio.sleep(0.05, result=i), update, context, action=ChatAction.UPLOAD_DOCUMENT, interval=1
+            )
+            for i in range(3)
+        ]
+        return await asyncio.gather(*jobs)
+
+    assert asyncio.run(scenario()) == [0, 1, 2]
+    assert sent == [(5, ChatAction.UPLOAD_DOCUMENT)]
+    assert chat_actions._action_loops == {}
@@ -0,0 +1,111 @@
+"""user_settings storage tests — temporary SQLite file, no network."""
+
+import asyncio
+
+import pytest
+
+from services import db
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    pool = db.DBPool(str(tmp_path / "users.db"), min_pool_size=2, max_pool_size=2)
+    monkeypatch.setattr(db, "db_pool", pool)
+    monkeypatch.setattr(db, "_settings_cache", {})
+    return pool
+
+
+def test_upsert_keeps_unspecified_columns(temp_db):
+    async def scenario():
+        await db.init_db()
+        try:
+            await db.set_user_settings(1, preferred_format="fb2")
+            await db.set_user_settings(1, preferred_search_mode="book")
+            await db.set_user_settings(1, preferred_book_naming="title_id")
+            return await db.get_user_settings(1)
+        finally:
+            await db.close_db()
+
+    settings = asyncio.run(scenario())
+    assert settings == {
+        "preferred_format": "fb2",
+        "preferred_search_mode": "book",
+        "preferred_book_naming": "title_id",
+    }
+
+
+def test_repeated_writes_are_visible_to_all_pool_connections(temp_db):
+    async def scenario():
+        await db.init_db()
+        try:
+            seen = []
+            for fmt in ("fb2", "epub", "pdf", "mobi"):
+                await db.set_user_settings(7, preferred_format=fmt)
+                seen.append((await db.get_user_settings(7))["preferred_format"])
+            return seen
+        finally:
+            await db.close_db()
+
+    assert asyncio.run(scenario()) == ["fb2", "epub", "pdf", "mobi"]
+
+
+def test_unknown_user_has_empty_settings(temp_db):
+    async def scenario():
+        await db.init_db()
+        try:
+            return await db.get_user_settings(42)
+        finally:
+            await db.close_db()
+
+    assert asyncio.run(scenario()) == {
+        "preferred_format": None,
+        "preferred_search_mode": None,
+        "preferred_book_naming": None,
+    }
+
+
+def test_settings_cache_is_invalidated_on_write(temp_db):
+    async def scenario():
+        await db.init_db()
+        try:
+            await db.set_user_settings(3, preferred_format="fb2")
+            first = await db.get_user_settings(3)
+            assert 3 in db._settings_cache
+
+            # Снаружи кэш не портится
+            first["preferred_format"] = "broken"
+            assert (await db.get_user_settings(3))["preferred_format"] == "fb2"
+
+            await db.set_user_settings(3, preferred_format="epub")
+            assert 3 not in db._settings_cache
+            return await db.get_user_settings(3)
+        finally:
+            await db.close_db()
+
+    assert asyncio.run(scenario())["preferred_format"] == "epub"
+
+
+def test_close_db_returns_free_pages(temp_db):
+    import aiosqlite
+
+    async def freelist_count(conn) -> int:
+        async with conn.execute("PRAGMA freelist_count;") as cursor:
+            return (await cursor.fetchone())[0]
+
+    async def scenario():
+        await db.init_db()
+        async with temp_db.connection() as conn:
+            await conn.executemany(
+                "INSERT INTO user_settings (user_id, preferred_format) VALUES (?, ?)",
+                [(i, "x" * 2000) for i in range(300)],
+            )
+            await conn.execute("DELETE FROM user_settings")
+            await conn.commit()
+            before = await freelist_count(conn)
+        await db.close_db()
+        async with aiosqlite.connect(temp_db.db_path) as conn:
+            return before, await freelist_count(conn)
+
+    before, after = asyncio.run(scenario())
+    assert before > 100
+    assert after == before - 100
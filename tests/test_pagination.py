@@ -0,0 +1,150 @@
+"""Pagination state tests — pure in-memory, no bot token required."""
+
+import asyncio
+
+from config import SEARCH_RESULTS_PER_PAGE
+from utils import state
+from utils.pagination import build_page_text, build_pagination_kb, build_pages_text
+
+USER_ID = 101
+
+
+def _records(n: int) -> list[str]:
+    return [f"record {i}\n" for i in range(n)]
+
+
+def test_build_pages_text_renders_every_page_once():
+    records = _records(SEARCH_RESULTS_PER_PAGE * 2 + 1)
+    pages = build_pages_text(records)
+
+    assert len(pages) == 3
+    assert pages[0].startswith("Страница 1/3\n\n")
+    assert pages[-1] == "Страница 3/3\n\n" + records[-1]
+
+
+def test_page_text_and_keyboard_follow_current_page():
+    records = _records(SEARCH_RESULTS_PER_PAGE * 2)
+    state.set_user_search_data(USER_ID, build_pages_text(records))
+    try:
+        assert build_page_text(USER_ID).startswith("Страница 1/2")
+        first_kb = build_pagination_kb(USER_ID)
+
+        state.update_user_search_page(USER_ID, "NEXT")
+        assert build_page_text(USER_ID).startswith("Страница 2/2")
+        assert build_pagination_kb(USER_ID) != first_kb
+
+        state.update_user_search_page(USER_ID, "NEXT")  # дальше последней не уходим
+        assert build_page_text(USER_ID).startswith("Страница 2/2")
+    finally:
+        state.clear_user_search_data(USER_ID)
+
+
+def test_single_page_has_no_keyboard():
+    records = _records(1)
+    state.set_user_search_data(USER_ID, build_pages_text(records))
+    try:
+        assert build_pagination_kb(USER_ID) is None
+    finally:
+        state.clear_user_search_data(USER_ID)
+
+
+def test_missing_search_data():
+    state.clear_user_search_data(USER_ID)
+    assert build_page_text(USER_ID) == "Данные поиска отсутствуют."
+    assert build_pagination_kb(USER_ID) is None
+
+
+def test_empty_results_have_no_pages():
+    state.set_user_search_data(USER_ID, build_pages_text([]))
+    try:
+        assert build_page_text(USER_ID) == "Ничего не найдено."
+        assert build_pagination_kb(USER_ID) is None
+    finally:
+        state.clear_user_search_data(USER_ID)
+
+
+def test_rapid_page_clicks_produce_one_edit(monkeypatch):
+    from types import SimpleNamespace
+
+    from utils import pagination
+
+    edits = []
+
+    async def fake_edit(target, text, reply_markup=None, *, answer=True):
+        edits.append(text)
+
+    async def fake_answer(**kwargs):
+        pass
+
+    monkeypatch.setattr(pagination, "send_or_edit_message", fake_edit)
+    monkeypatch.setattr(pagination, "PAGINATION_DEBOUNCE_SECONDS", 0.01)
+
+    records = _records(SEARCH_RESULTS_PER_PAGE * 3)
+    state.set_user_search_data(USER_ID, build_pages_text(records))
+
+    def click():
+        query = SimpleNamespace(
+            data=pagination.CB_NEXT, from_user=SimpleNamespace(id=USER_ID), answer=fake_answer
+        )
+        return SimpleNamespace(callback_query=query)
+
+    async def scenario():
+        context = SimpleNamespace(application=None)
+        for _ in range(2):
+            await pagination.pagination_callback_handler(click(), context)
+        await asyncio.sleep(0.05)
+
+    try:
+        asyncio.run(scenario())
+        assert len(edits) == 1
+        assert edits[0].startswith("Страница 3/3")
+    finally:
+        state.clear_user_search_data(USER_ID)
+
+
+def test_pages_fit_telegram_message_limit():
+    records = ["x" * 1500 + "\n" for _ in range(SEARCH_RESULTS_PER_PAGE)]
+    pages = build_pages_text(records)
+
+    assert len(pages) > 1
+    assert all(len(page) <= 4096 for page in pages)
+    assert sum(page.count("x" * 1500) for page in pages) == len(records)
+
+
+def test_pending_page_edit_is_dropped_after_new_search(monkeypatch):
+    from types import SimpleNamespace
+
+    from utils import pagination
+
+    edits = []
+
+    async def fake_edit(target, text, reply_markup=None, *, answer=True):
+        edits.append(text)
+
+    async def fake_answer(**kwargs):
+        pass
+
+    monkeypatch.setattr(pagination, "send_or_edit_message", fake_edit)
+    monkeypatch.setattr(pagination, "PAGINATION_DEBOUNCE_SECONDS", 0.01)
+
+    state.set_user_search_data(USER_ID, build_pages_text(_records(SEARCH_RESULTS_PER_PAGE * 3)))
+    query = SimpleNamespace(
+        data=pagination.CB_NEXT,
+        from_user=SimpleNamespace(id=USER_ID),
+        message=SimpleNamespace(message_id=1),
+        answer=fake_answer,
+    )
+
+    async def scenario():
+        await pagination.pagination_callback_handler(
+            SimpleNamespace(callback_query=query), SimpleNamespace(application=None)
+        )
+        # новый поиск до срабатывания таймера — старое сообщение не перерисовываем
+        state.set_user_search_data(USER_ID, build_pages_text(_records(1)))
+        await asyncio.sleep(0.05)
+
+    try:
+        asyncio.run(scenario())
+        assert edits == []
+    finally:
+        state.clear_user_search_data(USER_ID)
@@ -0,0 +1,162 @@
+"""services.service cache tests — the network fetchers are replaced, no HTTP."""
+
+import asyncio
+
+import pytest
+
+from services import service
+
+
+def test_book_details_are_cached_and_copied(monkeypatch):
+    calls = []
+
+    async def fake_fetch(book_id):
+        calls.append(book_id)
+        return {"id": book_id, "title": "T", "formats": ["fb2"]}
+
+    monkeypatch.setattr(service, "_fetch_book_details", fake_fetch)
+    monkeypatch.setattr(service, "_details_cache", {})
+
+    async def scenario():
+        first = await service.get_book_details("1")
+        first["formats"].append("broken")
+        return await service.get_book_details("1")
+
+    assert asyncio.run(scenario())["formats"] == ["fb2"]
+    assert calls == ["1"]
+
+
+def test_concurrent_identical_requests_share_one_fetch(monkeypatch):
+    calls = []
+
+    async def fake_fetch(author_id, default_author=None):
+        calls.append(author_id)
+        await asyncio.sleep(0.01)
+        return [{"id": "1", "title": "T", "author": "A"}]
+
+    monkeypatch.setattr(service, "_fetch_author_books", fake_fetch)
+    monkeypatch.setattr(service, "_author_books_cache", {})
+
+    async def scenario():
+        return await asyncio.gather(*(service.get_author_books("5") for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert calls == ["5"]
+    assert results[0] == results[1] == results[2]
+    assert results[0] is not results[1]
+    assert service._inflight == {}
+
+
+def test_search_cache_ignores_case_and_whitespace(monkeypatch):
+    calls = []
+
+    async def fake_fetch(query, mode):
+        calls.append((query, mode))
+        return {"books_found": [{"id": "1", "title": "T", "author": "A"}], "authors_found": []}
+
+    monkeypatch.setattr(service, "_fetch_search", fake_fetch)
+    monkeypatch.setattr(service, "_search_cache", {})
+
+    async def scenario():
+        await service.search_books_and_authors("Пикник на обочине", "general")
+        await service.search_books_and_authors("  ПИКНИК  на\tобочине ", "general")
+        await service.search_books_and_authors("пикник на обочине", "book")
+
+    asyncio.run(scenario())
+    assert calls == [("Пикник на обочине", "general"), ("пикник на обочине", "book")]
+
+
+def test_empty_search_result_is_not_cached(monkeypatch):
+    calls = []
+
+    async def fake_fetch(query, mode):
+        calls.append(query)
+        return {"books_found": [], "authors_found": []}
+
+    monkeypatch.setattr(service, "_fetch_search", fake_fetch)
+    monkeypatch.setattr(service, "_search_cache", {})
+
+    async def scenario():
+        for _ in range(2):
+            await service.search_books_and_authors("капча", "general")
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def _patch_download(monkeypatch, body):
+    from types import SimpleNamespace
+
+    class FakeContent:
+        async def iter_chunked(self, size):
+            for chunk in body:
+                yield chunk
+
+    class FakeResponse:
+        status = 200
+        content_length = None
+        url = "http://mirror/b/1/fb2"
+        content = FakeContent()
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+    async def fake_session():
+        return SimpleNamespace(get=lambda url, timeout: FakeResponse())
+
+    async def no_wait():
+        pass
+
+    async def best_mirror():
+        return {"url": "http://mirror", "penalty": 0}
+
+    monkeypatch.setattr(service, "_ensure_session", fake_session)
+    monkeypatch.setattr(service, "rate_limit", no_wait)
+    monkeypatch.setattr(service, "_pick_best_mirror", best_mirror)
+
+
+def test_downloaded_book_can_be_sent_as_document(monkeypatch):
+    from telegram import Document, InputFile
+    from telegram._utils.files import parse_file_input
+
+    body = [b"<FictionBook>", b"</FictionBook>"]
+    _patch_download(monkeypatch, body)
+
+    data = asyncio.run(service.download_book("1", "fb2"))
+    document = parse_file_input(data, tg_type=Document, filename="book_1.fb2")
+
+    assert isinstance(document, InputFile)
+    assert document.filename == "book_1.fb2"
+    assert document.input_file_content == b"".join(body)
+
+
+def test_oversized_download_is_aborted(monkeypatch):
+    _patch_download(monkeypatch, [b"x" * 8] * 4)
+    monkeypatch.setattr(service, "DOWNLOAD_MAX_BYTES", 16)
+
+    with pytest.raises(service.BookTooLargeError):
+        asyncio.run(service.download_book("1", "fb2"))
+
+
+def test_concurrent_downloads_of_one_book_share_one_fetch(monkeypatch):
+    calls = []
+
+    async def fake_fetch(book_id, fmt):
+        calls.append((book_id, fmt))
+        await asyncio.sleep(0.01)
+        return b"<FictionBook/>"
+
+    monkeypatch.setattr(service, "_fetch_book_file", fake_fetch)
+
+    async def scenario():
+        return await asyncio.gather(
+            service.download_book("1", "fb2"),
+            service.download_book("1", "fb2"),
+            service.download_book("1", "epub"),
+        )
+
+    assert asyncio.run(scenario()) == [b"<FictionBook/>"] * 3
+    assert calls == [("1", "fb2"), ("1", "epub")]
@@ -0,0 +1,62 @@
+"""PerUserSerialUpdateProcessor tests — plain objects instead of telegram updates."""
+
+import asyncio
+from types import SimpleNamespace
+
+from utils.update_processor import PerUserSerialUpdateProcessor
+
+
+def _update(user_id: int, serial: bool) -> SimpleNamespace:
+    return SimpleNamespace(effective_user=SimpleNamespace(id=user_id), serial=serial)
+
+
+def test_serial_updates_of_one_user_do_not_overlap():
+    processor = PerUserSerialUpdateProcessor(8, is_serial=lambda u: u.serial)
+    running = {"serial": 0, "max_serial": 0, "max_total": 0, "total": 0}
+
+    async def work(update):
+        running["total"] += 1
+        running["max_total"] = max(running["max_total"], running["total"])
+        if update.serial:
+            running["serial"] += 1
+            running["max_serial"] = max(running["max_serial"], running["serial"])
+        await asyncio.sleep(0.01)
+        if update.serial:
+            running["serial"] -= 1
+        running["total"] -= 1
+
+    async def scenario():
+        updates = [_update(1, True) for _ in range(3)] + [_update(1, False) for _ in range(3)]
+        await asyncio.gather(*(processor.process_update(u, work(u)) for u in updates))
+
+    asyncio.run(scenario())
+    assert running["max_serial"] == 1
+    assert running["max_total"] > 1
+
+
+def test_waiting_serial_updates_do_not_starve_other_users():
+    processor = PerUserSerialUpdateProcessor(2, is_serial=lambda u: u.serial)
+    release = None
+
+    async def blocked(update):
+        await release.wait()
+
+    async def quick(update):
+        pass
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        # Пользователь 1 держит свой замок, и за ним в очереди стоит больше апдейтов, чем слотов
+        queued = [
+            asyncio.create_task(processor.process_update(u, blocked(u)))
+            for u in (_update(1, True) for _ in range(5))
+        ]
+        await asyncio.sleep(0)
+        other = _update(2, False)
+        await asyncio.wait_for(processor.process_update(other, quick(other)), timeout=1)
+        release.set()
+        await asyncio.gather(*queued)
+
+    asyncio.run(scenario())
+    assert processor.max_concurrent_updates == 2
@@ -0,0 +1,31 @@
+"""utils.utils helpers — built from plain telegram objects, no bot token required."""
+
+import datetime
+
+from telegram import Chat, InlineKeyboardButton, InlineKeyboardMarkup, Message, MessageEntity
+
+from utils.utils import _is_unchanged, sanitize_filename
+
+
+def _kb(label: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[InlineKeyboardButton(label, callback_data="cb")]])
+
+
+def test_is_unchanged_compares_html_and_markup():
+    msg = Message(
+        1,
+        datetime.datetime.now(datetime.timezone.utc),
+        Chat(1, Chat.PRIVATE),
+        text="Формат: fb2",
+        entities=[MessageEntity(MessageEntity.BOLD, 0, 6)],
+        reply_markup=_kb("fb2"),
+    )
+
+    assert _is_unchanged(msg, "<b>Формат</b>: fb2\n", _kb("fb2"))
+    assert not _is_unchanged(msg, "<b>Формат</b>: epub", _kb("fb2"))
+    assert not _is_unchanged(msg, "<b>Формат</b>: fb2", _kb("epub"))
+    assert not _is_unchanged(None, "<b>Формат</b>: fb2", _kb("fb2"))
+
+
+def test_sanitize_filename_strips_forbidden_characters():
+    assert sanitize_filename(' Что? Где: "Когда" <1/2> a\\b*c|d ') == "Что Где Когда 12 abcd"
@@ -3,16 +3,30 @@
 import asyncio
 import logging
 from contextlib import suppress
-from typing import Awaitable, TypeVar
+from dataclasses import dataclass
+from typing import Awaitable, Dict, Tuple, TypeVar
 
 from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.constants import ChatAction
+from telegram.error import TelegramError
 
 logger = logging.getLogger(__name__)
 T = TypeVar("T")
 
 
+@dataclass(slots=True)
+class _ActionLoop:
+    """Фоновая отправка одного chat action в один чат и число корутин, которые её ждут."""
+    task: "asyncio.Task[None]"
+    stop_event: asyncio.Event
+    users: int = 0
+
+
+# (chat_id, action) -> общий цикл отправки: параллельные загрузки в одном чате не дублируют запросы
+_action_loops: Dict[Tuple[int, str], _ActionLoop] = {}
+
+
 def _get_chat_id(update: Update) -> int:
     """Безопасно достаём chat_id или бросаем ValueError (чтобы не падать молча)."""
     chat = update.effective_chat
@@ -40,32 +54,18 @@ async def set_typing_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
             chat_id=chat_id,
             action=ChatAction.TYPING
         )
-    except Exception as e:
+    except TelegramError as e:
         # Не роняем хендлер из-за временных сетевых/лимитных ошибок
         logger.warning("set_typing_action failed: %s", e)
 
 
-async def set_upload_document_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
+def fire_typing_action(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
-    Отправляет статус "загружает документ..." в чат.
-
-    Args:
-        update (Update): Обновление Telegram.
-        context (ContextTypes.DEFAULT_TYPE): Контекст выполнения.
+    Отправляет "печатает..." в фоне, не дожидаясь ответа Telegram: статус чисто косметический,
+    и хендлер не должен ждать лишний HTTP round-trip. Ошибки логирует сама set_typing_action.
     """
-    try:
-        chat_id = _get_chat_id(update)
-    except ValueError as e:
-        logger.warning("set_upload_document_action: %s", e)
-        return
-
-    try:
-        await context.bot.send_chat_action(
-            chat_id=chat_id,
-            action=ChatAction.UPLOAD_DOCUMENT
-        )
-    except Exception as e:
-        logger.warning("set_upload_document_action failed: %s", e)
+    create_task = getattr(context.application, "create_task", asyncio.create_task)
+    create_task(set_typing_action(update, context))
 
 
 async def periodic_chat_action(update: Update, context: ContextTypes.DEFAULT_TYPE, action: str, interval: float, stop_event: asyncio.Event):
@@ -95,7 +95,7 @@ async def periodic_chat_action(update: Update, context: ContextTypes.DEFAULT_TYP
                 chat_id=chat_id,
                 action=action
             )
-        except Exception as e:
+        except TelegramError as e:
             # Логируем и продолжаем — не срываем периодическую отправку
             logger.warning("periodic_chat_action send failed: %s", e)
 
@@ -107,7 +107,8 @@ async def periodic_chat_action(update: Update, context: ContextTypes.DEFAULT_TYP
 async def run_with_periodic_action(coro, update: Update, context: ContextTypes.DEFAULT_TYPE, action: str = ChatAction.TYPING, interval: float = 4):
     """
     Запускает корутину параллельно с периодическим обновлением chat action.
-    Как только основная корутина завершается, периодическая отправка прекращается.
+    Несколько корутин в одном чате с одним action делят один цикл отправки;
+    он останавливается, когда завершается последняя из них.
 
     Args:
         coro (Awaitable[Any]): Корутина, которую необходимо выполнить.
@@ -119,22 +120,36 @@ async def run_with_periodic_action(coro, update: Update, context: ContextTypes.D
     Returns:
         Any: Результат выполнения корутины.
     """
-    stop_event = asyncio.Event()
-
-    # Создаём фоновую задачу связанную с жизненным циклом приложения, если доступно
-    create_task = getattr(context.application, "create_task", asyncio.create_task)
-    periodic_task = create_task(
-        periodic_chat_action(update, context, action, interval, stop_event)
-    )
+    try:
+        key = (_get_chat_id(update), action)
+    except ValueError as e:
+        logger.warning("run_with_periodic_action: %s", e)
+        return await coro
+
+    loop = _action_loops.get(key)
+    if loop is None or loop.task.done():
+        stop_event = asyncio.Event()
+        # Создаём фоновую задачу связанную с жизненным циклом приложения, если доступно
+        create_task = getattr(context.application, "create_task", asyncio.create_task)
+        loop = _ActionLoop(
+            task=create_task(periodic_chat_action(update, context, action, interval, stop_event)),
+            stop_event=stop_event,
+        )
+        _action_loops[key] = loop
+    loop.users += 1
 
     try:
         result = await coro
         return result
     finally:
-        # Сигнализируем о завершении и корректно дожидаемся фоновой задачи
-        stop_event.set()
-        if not periodic_task.done():
-            # мягкая отмена, если задача еще в ожидании таймера
-            periodic_task.cancel()
-            with suppress(asyncio.CancelledError):
-                await periodic_task
+        loop.users -= 1
+        if loop.users == 0:
+            if _action_loops.get(key) is loop:
+                del _action_loops[key]
+            # Сигнализируем о завершении и корректно дожидаемся фоновой задачи
+            loop.stop_event.set()
+            if not loop.task.done():
+                # мягкая отмена, если задача еще в ожидании таймера
+                loop.task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await loop.task
@@ -1,13 +1,15 @@
+import asyncio
 import logging
-from typing import cast
-from math import ceil
-from typing import Optional, TypedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery
+from telegram.constants import MessageLimit
 from telegram.ext import ContextTypes
+from telegram.error import TelegramError
 
-from config import SEARCH_RESULTS_PER_PAGE
-from utils.state import get_user_search_data, update_user_search_page
+from config import SEARCH_RESULTS_PER_PAGE, PAGINATION_DEBOUNCE_SECONDS
+from utils.state import SearchState, get_user_search_data, update_user_search_page
 from utils.utils import send_or_edit_message
 
 logger = logging.getLogger(__name__)
@@ -18,11 +20,9 @@ CB_NEXT = f"{CB_PREFIX}|NEXT"
 CB_PREV = f"{CB_PREFIX}|PREV"
 CB_NOOP = "no-op"
 
-
-class SearchState(TypedDict):
-    records: list[str]
-    page: int
-    pages: int
+# (user_id, message_id) -> отложенная перерисовка страницы (новое нажатие в том же сообщении
+# отменяет предыдущую; нажатия в разных сообщениях друг другу не мешают)
+_pending_edits: Dict[Tuple[int, Optional[int]], "asyncio.Task[None]"] = {}
 
 
 def _safe_per_page() -> int:
@@ -34,89 +34,92 @@ def _safe_per_page() -> int:
     return max(1, n)
 
 
-def _compute_total_pages(records_count: int, per_page: int) -> int:
-    return max(1, ceil(records_count / per_page)) if records_count > 0 else 1
+def _split_into_pages(records: List[str], per_page: int, max_len: int) -> List[List[str]]:
+    """
+    Раскладывает записи по страницам: не больше per_page записей и не больше max_len символов
+    на страницу (записи соединяются через "\n"). Запись никогда не разрезается.
+    """
+    pages: List[List[str]] = []
+    current: List[str] = []
+    current_len = 0
+    for rec in records:
+        added = len(rec) + (1 if current else 0)
+        if current and (len(current) >= per_page or current_len + added > max_len):
+            pages.append(current)
+            current, current_len = [], 0
+            added = len(rec)
+        current.append(rec)
+        current_len += added
+    if current:
+        pages.append(current)
+    return pages
+
+
+def build_pages_text(records: List[str]) -> List[str]:
+    """
+    Один раз рендерит все страницы результатов (с заголовком «Страница i/N»),
+    чтобы перелистывание было просто выборкой по индексу.
+    Страница не длиннее лимита Telegram на текст сообщения (4096 символов).
+    """
+    if not records:
+        return []
+    # Заголовок с запасом: номер страницы не больше числа записей
+    header_len = len(f"Страница {len(records)}/{len(records)}\n\n")
+    pages = _split_into_pages(records, _safe_per_page(), MessageLimit.MAX_TEXT_LENGTH - header_len)
+    total_pages = len(pages)
+    return [
+        "\n".join([f"Страница {i}/{total_pages}", ""] + page)
+        for i, page in enumerate(pages, start=1)
+    ]
+
+
+def _current_page(info: SearchState, total_pages: int) -> int:
+    """Текущая страница, зажатая в допустимые границы."""
+    return min(max(info.page, 1), total_pages)
 
 
 def build_page_text(user_id: int) -> str:
     """
-    Формирует текст для текущей страницы с результатами поиска.
+    Возвращает заранее отрендеренный текст текущей страницы с результатами поиска.
     """
-    info = cast(Optional[SearchState], get_user_search_data(user_id))
+    info = get_user_search_data(user_id)
     if not info:
         return "Данные поиска отсутствуют."
 
-    records = info.get("records", []) or []
-    current_page = int(info.get("page", 1) or 1)
-
-    per_page = _safe_per_page()
-    total_pages_dynamic = _compute_total_pages(len(records), per_page)
-
-    # Если сохранённый total_pages устарел — используем динамический
-    total_pages = max(int(info.get("pages", 1) or 1), 1)
-    if total_pages != total_pages_dynamic:
-        total_pages = total_pages_dynamic
-
-    # Зажимаем текущую страницу в допустимые границы
-    if current_page > total_pages:
-        current_page = total_pages
-    if current_page < 1:
-        current_page = 1
-
-    if not records:
+    pages_text = info.pages_text
+    if not pages_text:
         return "Ничего не найдено."
 
-    start_index = (current_page - 1) * per_page
-    end_index = start_index + per_page
-    chunk = records[start_index:end_index]
+    return pages_text[_current_page(info, len(pages_text)) - 1]
 
-    # Если после пересчёта вдруг пусто (например, список сократился) — откат на последнюю страницу
-    if not chunk and total_pages > 1:
-        start_index = (total_pages - 1) * per_page
-        end_index = start_index + per_page
-        chunk = records[start_index:end_index]
-        current_page = total_pages
 
-    lines = [f"Страница {current_page}/{total_pages}", ""]
-    lines.extend(chunk)
-    return "\n".join(lines)
+@lru_cache(maxsize=256)
+def _pagination_kb(current_page: int, total_pages: int) -> InlineKeyboardMarkup:
+    """Клавиатура навигации для пары (страница, всего страниц) — одна на все запросы."""
+    btn_prev = InlineKeyboardButton("« Назад", callback_data=CB_PREV) if current_page > 1 else InlineKeyboardButton(" ", callback_data=CB_NOOP)
+    btn_next = InlineKeyboardButton("Вперёд »", callback_data=CB_NEXT) if current_page < total_pages else InlineKeyboardButton(" ", callback_data=CB_NOOP)
+
+    row = [
+        btn_prev,
+        InlineKeyboardButton(f"{current_page}/{total_pages}", callback_data=CB_NOOP),
+        btn_next,
+    ]
+    return InlineKeyboardMarkup([row])
 
 
 def build_pagination_kb(user_id: int) -> Optional[InlineKeyboardMarkup]:
     """
     Создаёт кнопки навигации для пагинации.
     """
-    info = cast(Optional[SearchState], get_user_search_data(user_id))
+    info = get_user_search_data(user_id)
     if not info:
         return None
 
-    records = info.get("records", []) or []
-    per_page = _safe_per_page()
-    total_pages_dynamic = _compute_total_pages(len(records), per_page)
-
-    current_page = int(info.get("page", 1) or 1)
-    total_pages_saved = max(int(info.get("pages", 1) or 1), 1)
-    total_pages = max(total_pages_dynamic, total_pages_saved)  # подстраховка
-
+    total_pages = len(info.pages_text)
     if total_pages <= 1:
         return None
 
-    # Зажимаем текущую страницу
-    if current_page > total_pages:
-        current_page = total_pages
-    if current_page < 1:
-        current_page = 1
-
-    # Кнопки
-    btn_prev = InlineKeyboardButton("« Назад", callback_data=CB_PREV) if current_page > 1 else InlineKeyboardButton(" ", callback_data=CB_NOOP)
-    btn_next = InlineKeyboardButton("Вперёд »", callback_data=CB_NEXT) if current_page < total_pages else InlineKeyboardButton(" ", callback_data=CB_NOOP)
-
-    row = [
-        btn_prev,
-        InlineKeyboardButton(f"{current_page}/{total_pages}", callback_data=CB_NOOP),
-        btn_next,
-    ]
-    return InlineKeyboardMarkup([row])
+    return _pagination_kb(_current_page(info, total_pages), total_pages)
 
 
 async def pagination_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -130,7 +133,7 @@ async def pagination_callback_handler(update: Update, context: ContextTypes.DEFA
 
     try:
         await query.answer(cache_time=0, show_alert=False)
-    except Exception:
+    except TelegramError:
         # не критично, продолжаем
         pass
 
@@ -158,6 +161,33 @@ async def pagination_callback_handler(update: Update, context: ContextTypes.DEFA
     else:
         logger.warning("Неизвестное действие пагинации: %r", data)
 
+    # Номер страницы уже сдвинут; само сообщение перерисуем одним запросом после паузы
+    message = getattr(query, "message", None)
+    key = (user_id, message.message_id if message is not None else None)
+    pending = _pending_edits.get(key)
+    if pending is not None and not pending.done():
+        pending.cancel()
+    create_task = getattr(context.application, "create_task", asyncio.create_task)
+    task = create_task(_render_page_later(user_id, query, search_data.pages_text))
+    _pending_edits[key] = task
+
+    def _forget(t: "asyncio.Task[None]") -> None:
+        if _pending_edits.get(key) is t:
+            del _pending_edits[key]
+
+    task.add_done_callback(_forget)
+
+
+async def _render_page_later(user_id: int, query: CallbackQuery, pages_text: List[str]) -> None:
+    """
+    Через PAGINATION_DEBOUNCE_SECONDS перерисовывает сообщение под актуальную страницу.
+    Если за это время пользователь запустил новый поиск, старое сообщение не трогаем.
+    """
+    await asyncio.sleep(PAGINATION_DEBOUNCE_SECONDS)
+    info = get_user_search_data(user_id)
+    if info is None or info.pages_text is not pages_text:
+        logger.debug("Поиск пользователя %s сменился — отложенная перерисовка пропущена.", user_id)
+        return
     new_text = build_page_text(user_id)
     new_kb = build_pagination_kb(user_id)
-    await send_or_edit_message(update, new_text, reply_markup=new_kb)
+    await send_or_edit_message(query, new_text, reply_markup=new_kb, answer=False)
@@ -1,46 +1,51 @@
 # state.py
 
-import datetime
 import threading
-from typing import Optional, Any, Dict, List
-from config import DATA_EXPIRATION_TIME
+from dataclasses import dataclass, replace
+from typing import Optional, List
 
-# Глобальные структуры состояния
-user_ephemeral_mode: Dict[int, Dict[str, Any]] = {}
-author_mapping: Dict[str, str] = {}
-user_search_data: Dict[int, Dict[str, Any]] = {}
+from cachetools import LRUCache, TTLCache
+
+from config import DATA_EXPIRATION_TIME, SEARCH_DATA_EXPIRATION_TIME
+
+
+@dataclass(slots=True)
+class SearchState:
+    """Состояние пагинации пользователя: заранее отрендеренные страницы и текущая страница."""
+    pages_text: List[str]
+    page: int = 1
+
+    @property
+    def pages(self) -> int:
+        return max(1, len(self.pages_text))
+
+
+# Глобальные структуры состояния.
+# Пользовательские данные ограничены по времени жизни и по числу записей —
+# TTLCache/LRUCache вытесняют старое сами, словари не растут бесконечно.
+_MAX_USERS = 10_000
+_MAX_AUTHORS = 50_000
+user_ephemeral_mode: "TTLCache[int, str]" = TTLCache(maxsize=_MAX_USERS, ttl=DATA_EXPIRATION_TIME)
+author_mapping: "LRUCache[str, str]" = LRUCache(maxsize=_MAX_AUTHORS)
+user_search_data: "TTLCache[int, SearchState]" = TTLCache(maxsize=_MAX_USERS, ttl=SEARCH_DATA_EXPIRATION_TIME)
 
 # Рекурсивная блокировка для всех структур (не требует await и не ломает API)
 _state_lock = threading.RLock()
 
 
 async def cleanup_old_data():
-    """Очищает устаревшие данные пользователей (по таймауту от timestamp)."""
-    now = datetime.datetime.now(datetime.timezone.utc)
-    expired_users: List[int] = []
-
-    # Берём снимок под локом
+    """Явно вычищает просроченные записи (TTLCache иначе делает это лениво, при обращениях)."""
     with _state_lock:
-        for user_id, data in list(user_ephemeral_mode.items()):
-            ts: Optional[datetime.datetime] = data.get("timestamp")
-            if ts and (now - ts).total_seconds() > DATA_EXPIRATION_TIME:
-                expired_users.append(user_id)
-
-        for user_id in expired_users:
-            user_ephemeral_mode.pop(user_id, None)
-            user_search_data.pop(user_id, None)
+        user_ephemeral_mode.expire()
+        user_search_data.expire()
 
 
 def set_user_ephemeral_mode(user_id: int, mode: str) -> None:
     """
-    Устанавливает временный режим поиска для пользователя.
-    Хранится как dict: {"mode": str, "timestamp": datetime}.
+    Устанавливает временный режим поиска для пользователя (истекает через DATA_EXPIRATION_TIME).
     """
     with _state_lock:
-        user_ephemeral_mode[user_id] = {
-            "mode": mode,
-            "timestamp": datetime.datetime.now(datetime.timezone.utc),
-        }
+        user_ephemeral_mode[user_id] = mode
 
 
 def get_user_ephemeral_mode(user_id: int) -> Optional[str]:
@@ -48,8 +53,7 @@ def get_user_ephemeral_mode(user_id: int) -> Optional[str]:
     Возвращает временный режим поиска для пользователя или None.
     """
     with _state_lock:
-        data = user_ephemeral_mode.get(user_id)
-        return data["mode"] if data else None
+        return user_ephemeral_mode.get(user_id)
 
 
 def clear_user_ephemeral_mode(user_id: int) -> None:
@@ -70,21 +74,20 @@ def get_author_mapping(author_id: str) -> str:
         return author_mapping.get(author_id, "Неизвестен")
 
 
-def set_user_search_data(user_id: int, records: List[str], pages: int) -> None:
-    """Сохраняет результаты поиска для пользователя."""
+def set_user_search_data(user_id: int, pages_text: List[str]) -> None:
+    """
+    Сохраняет заранее отрендеренные страницы результатов поиска для пользователя.
+    Исходные строки не храним — они уже целиком лежат в pages_text.
+    """
     with _state_lock:
-        user_search_data[user_id] = {
-            "records": records,
-            "page": 1,
-            "pages": pages,
-        }
+        user_search_data[user_id] = SearchState(pages_text)
 
 
-def get_user_search_data(user_id: int) -> Optional[Dict[str, Any]]:
+def get_user_search_data(user_id: int) -> Optional[SearchState]:
     """Возвращает данные поиска пользователя или None (копию, чтобы снаружи не портили состояние)."""
     with _state_lock:
         data = user_search_data.get(user_id)
-        return dict(data) if data else None
+        return replace(data) if data else None
 
 
 def update_user_search_page(user_id: int, direction: str) -> None:
@@ -93,10 +96,10 @@ def update_user_search_page(user_id: int, direction: str) -> None:
         info = user_search_data.get(user_id)
         if not info:
             return
-        if direction == "NEXT" and info["page"] < info["pages"]:
-            info["page"] += 1
-        elif direction == "PREV" and info["page"] > 1:
-            info["page"] -= 1
+        if direction == "NEXT" and info.page < info.pages:
+            info.page += 1
+        elif direction == "PREV" and info.page > 1:
+            info.page -= 1
 
 
 def clear_user_search_data(user_id: int) -> None:
@@ -0,0 +1,76 @@
+# utils/stats.py
+
+import asyncio
+import datetime
+import logging
+from typing import List
+
+from config import STATS_FILE
+
+logger = logging.getLogger(__name__)
+
+# Пишем пачками: не больше _BATCH_SIZE строк или раз в _FLUSH_INTERVAL секунд
+_BATCH_SIZE = 64
+_FLUSH_INTERVAL = 0.5
+# Если писатель не успевает (например, диск недоступен) — новые строки отбрасываем
+_QUEUE_MAXSIZE = 10_000
+
+_stats_queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=_QUEUE_MAXSIZE)
+
+
+def record_query(user_id: int, chat_id: int, text: str) -> None:
+    """
+    Ставит строку статистики в очередь. Не блокирует event loop: сама запись
+    в STATS_FILE выполняется фоновой задачей stats_writer().
+    """
+    now = datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    line = f"{now} {user_id}:{chat_id} -> {' '.join(text.split())}\n"
+    try:
+        _stats_queue.put_nowait(line)
+    except asyncio.QueueFull:
+        logger.warning("Очередь статистики переполнена — строка отброшена.")
+
+
+def _append_lines(lines: List[str]) -> None:
+    with open(STATS_FILE, "a", encoding="utf-8") as f:
+        f.writelines(lines)
+
+
+async def _write_batch(lines: List[str]) -> None:
+    try:
+        await asyncio.to_thread(_append_lines, lines)
+    except OSError as e:
+        logger.warning("Не удалось записать статистику (%d строк): %s", len(lines), e)
+
+
+async def stats_writer() -> None:
+    """
+    Фоновая задача: забирает строки из очереди и дописывает их в STATS_FILE пачками.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _stats_queue.get()]
+        deadline = loop.time() + _FLUSH_INTERVAL
+        try:
+            while len(batch) < _BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(_stats_queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # Остановка посреди сборки пачки — уже забранные строки не теряем
+            await _write_batch(batch)
+            raise
+        await _write_batch(batch)
+
+
+async def flush_stats() -> None:
+    """Дописывает всё, что осталось в очереди (вызывается при остановке)."""
+    lines: List[str] = []
+    while not _stats_queue.empty():
+        lines.append(_stats_queue.get_nowait())
+    if lines:
+        await _write_batch(lines)
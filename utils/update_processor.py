@@ -0,0 +1,60 @@
+# utils/update_processor.py
+
+import asyncio
+import logging
+import weakref
+from typing import Any, Awaitable, Callable
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class PerUserSerialUpdateProcessor(BaseUpdateProcessor):
+    """
+    Обрабатывает апдейты параллельно (до max_concurrent_updates), но апдейты, для которых
+    is_serial(update) истинно, — строго по одному на пользователя.
+
+    Нужен для ConversationHandler: его состояние хранится per-user, и два одновременных
+    нажатия в меню настроек не должны гоняться друг с другом. Поиск, пагинация и скачивание
+    идут параллельно, как и раньше.
+
+    Замок пользователя берётся в process_update до общего семафора: апдейты, ждущие своей
+    очереди, не занимают слоты, и один пользователь, накидавший кучу нажатий, не может
+    выбрать их все.
+    """
+
+    __slots__ = ("_is_serial", "_user_locks")
+
+    def __init__(self, max_concurrent_updates: int, is_serial: Callable[[object], bool]):
+        super().__init__(max_concurrent_updates)
+        self._is_serial = is_serial
+        # Замок живёт, пока кто-то его держит или ждёт — словарь не растёт бесконечно
+        self._user_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    def _user_lock(self, user_id: int) -> asyncio.Lock:
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._user_locks[user_id] = lock
+        return lock
+
+    async def process_update(  # type: ignore[misc]  # в PTB помечен @final только для тайпчекеров
+        self, update: object, coroutine: Awaitable[Any]
+    ) -> None:
+        user = getattr(update, "effective_user", None)
+        if user is None or not self._is_serial(update):
+            await super().process_update(update, coroutine)
+            return
+
+        async with self._user_lock(user.id):
+            await super().process_update(update, coroutine)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
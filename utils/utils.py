@@ -10,11 +10,16 @@ from telegram import (
     CallbackQuery,
     Message,
 )
+from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 from telegram.error import BadRequest
 
 logger = logging.getLogger(__name__)
 
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+# Символы, недопустимые в именах файлов (Windows) — удаляются одним проходом str.translate
+_FILENAME_BAD_CHARS = str.maketrans("", "", '\\/*?:"<>|')
+
 
 async def no_op_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -31,8 +36,7 @@ def sanitize_filename(name: str) -> str:
     """
     Удаляет недопустимые символы из имени файла и обрезает лишние пробелы.
     """
-    name = re.sub(r'[\\/*?:"<>|]', "", name)
-    return name.strip()
+    return name.translate(_FILENAME_BAD_CHARS).strip()
 
 
 def shorten_title(title: str, max_length: int) -> str:
@@ -40,7 +44,7 @@ def shorten_title(title: str, max_length: int) -> str:
     Очищает название от всех символов, кроме букв, цифр и _, заменяет пробелы на _
     и обрезает корректно по словам; если ни одно слово не помещается — режет жёстко.
     """
-    title = re.sub(r"[^\w\s]", "", title)
+    title = _NON_WORD_RE.sub("", title)
     title = title.replace(" ", "_")
 
     if len(title) <= max_length:
@@ -56,6 +60,21 @@ def shorten_title(title: str, max_length: int) -> str:
     return shortened_title if shortened_title else title[:max_length]
 
 
+def _is_unchanged(
+    msg: object,
+    text: str,
+    reply_markup: Optional[InlineKeyboardMarkup],
+) -> bool:
+    """
+    True, если сообщение уже показывает ровно этот текст (HTML) и эту клавиатуру —
+    тогда редактирование не нужно, Telegram всё равно ответил бы «Message is not modified».
+    """
+    if not isinstance(msg, Message):
+        return False
+    current = msg.text_html if msg.text is not None else (msg.caption_html if msg.caption is not None else None)
+    return current == text.strip() and msg.reply_markup == reply_markup
+
+
 async def _edit_text_or_caption(
     cq: CallbackQuery,
     *,
@@ -78,7 +97,7 @@ async def _edit_text_or_caption(
             await cq.edit_message_text(
                 text=text,
                 reply_markup=reply_markup,
-                parse_mode="HTML",
+                parse_mode=ParseMode.HTML,
                 disable_web_page_preview=True,
             )
         else:
@@ -86,7 +105,7 @@ async def _edit_text_or_caption(
             await cq.edit_message_caption(
                 caption=text,
                 reply_markup=reply_markup,
-                parse_mode="HTML",
+                parse_mode=ParseMode.HTML,
             )
         return True
     except BadRequest as e:
@@ -126,11 +145,13 @@ async def send_or_edit_message(
     update_or_query: Union[Update, CallbackQuery],
     text: str,
     reply_markup: Optional[InlineKeyboardMarkup] = None,
+    *,
+    answer: bool = True,
 ) -> None:
     """
     Универсальная отправка/редактирование.
     Алгоритм для callback:
-      1) answer()
+      1) answer() (если answer=False — вызывающий уже ответил на callback сам)
       2) попытаться править текст/подпись с клавиатурой
       3) если "not modified" — попробовать править только клавиатуру
       4) если и это "not modified" — игнор без ошибки
@@ -138,10 +159,15 @@ async def send_or_edit_message(
     """
     # Ветка: передали сам CallbackQuery
     if isinstance(update_or_query, CallbackQuery):
-        try:
-            await update_or_query.answer(cache_time=0, show_alert=False)
-        except Exception as e:
-            logger.debug("send_or_edit_message: answer failed (raw CQ): %s", e)
+        if answer:
+            try:
+                await update_or_query.answer(cache_time=0, show_alert=False)
+            except Exception as e:
+                logger.debug("send_or_edit_message: answer failed (raw CQ): %s", e)
+
+        if _is_unchanged(update_or_query.message, text, reply_markup):
+            logger.debug("send_or_edit_message: содержимое не изменилось — редактирование пропущено")
+            return
 
         try:
             changed = await _edit_text_or_caption(update_or_query, text=text, reply_markup=reply_markup)
@@ -156,10 +182,15 @@ async def send_or_edit_message(
     # Ветка: Update, у которого есть callback_query
     if getattr(update_or_query, "callback_query", None):
         cq: CallbackQuery = update_or_query.callback_query  # type: ignore[attr-defined]
-        try:
-            await cq.answer(cache_time=0, show_alert=False)
-        except Exception as e:
-            logger.debug("send_or_edit_message: answer failed (Update.cq): %s", e)
+        if answer:
+            try:
+                await cq.answer(cache_time=0, show_alert=False)
+            except Exception as e:
+                logger.debug("send_or_edit_message: answer failed (Update.cq): %s", e)
+
+        if _is_unchanged(cq.message, text, reply_markup):
+            logger.debug("send_or_edit_message: содержимое не изменилось — редактирование пропущено")
+            return
 
         try:
             changed = await _edit_text_or_caption(cq, text=text, reply_markup=reply_markup)
@@ -177,7 +208,7 @@ async def send_or_edit_message(
             await update_or_query.message.reply_text(  # type: ignore[attr-defined]
                 text=text,
                 reply_markup=reply_markup,
-                parse_mode="HTML",
+                parse_mode=ParseMode.HTML,
                 disable_web_page_preview=True,
             )
         except Exception as e: